@@ -1,17 +1,24 @@
 from fastapi import APIRouter, Depends
 from typing import Annotated
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.services.jwt_handler import JWTBearer
+
 from .dependencies import get_user_service
 from ..services.users import UserService
+from ..services.rate_limiter import check_login_rate_limit
 from ..schemas.users import (
     SignInRequestSchema,
+    RefreshTokenRequestSchema,
     TokenSchema,
 )
+from ..schemas.sessions import SessionsListResponseSchema
 from ..db.redis_config import get_session
 from ..db.psql_config import get_async_session as psql_session
+from ..repositories.sessions import SessionRedisRepository
+from ..utils.error_handlers import filter_response_for_404_error
 
 
 auth_router = APIRouter(prefix="/auth", tags=["users"])
@@ -19,13 +26,59 @@ auth_router = APIRouter(prefix="/auth", tags=["users"])
 
 @auth_router.post("/login", response_model=TokenSchema, status_code=200)
 async def login(
+    request: Request,
     login_form: SignInRequestSchema,
     users_service: Annotated[UserService, Depends(get_user_service)],
     redis_session: Redis = Depends(get_session),
     psql_session: AsyncSession = Depends(psql_session),
 ):
+    await check_login_rate_limit(
+        redis_session,
+        request.client.host if request.client else "unknown",
+        login_form.email,
+    )
     return await users_service.login(
         redis_session,
         psql_session,
         login_form,
+        request.headers.get("user-agent"),
+    )
+
+
+@auth_router.post("/refresh", response_model=TokenSchema, status_code=200)
+async def refresh(
+    refresh_form: RefreshTokenRequestSchema,
+    users_service: Annotated[UserService, Depends(get_user_service)],
+    redis_session: Redis = Depends(get_session),
+    psql_session: AsyncSession = Depends(psql_session),
+):
+    return await users_service.refresh_tokens(
+        redis_session, psql_session, refresh_form.refresh_token
+    )
+
+
+@auth_router.get("/sessions", response_model=SessionsListResponseSchema)
+async def get_sessions(
+    token: Annotated[str, Depends(JWTBearer())],
+    users_service: Annotated[UserService, Depends(get_user_service)],
+    redis_session: Redis = Depends(get_session),
+    psql_session: AsyncSession = Depends(psql_session),
+):
+    return await users_service.get_sessions(redis_session, psql_session, token)
+
+
+@auth_router.delete("/sessions/{session_id}", status_code=204)
+async def revoke_session(
+    session_id: str,
+    token: Annotated[str, Depends(JWTBearer())],
+    users_service: Annotated[UserService, Depends(get_user_service)],
+    redis_session: Redis = Depends(get_session),
+    psql_session: AsyncSession = Depends(psql_session),
+):
+    return filter_response_for_404_error(
+        await users_service.revoke_session(
+            redis_session, psql_session, token, session_id
+        ),
+        SessionRedisRepository.model_name,
+        is_delete=True,
     )
@@ -1,8 +1,44 @@
 """Contains dependancies for api endpoints."""
 
+from typing import Annotated
+from fastapi import Depends
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession
+
 from ..services.users import UserService
+from ..services.jwt_handler import JWTBearer, get_unverified_email
 from ..repositories.users import UserSQLARepository, UserRedisRepository
+from ..repositories.sessions import SessionRedisRepository
+from ..db.redis_config import get_session
+from ..db.psql_config import (
+    get_async_session,
+    get_async_session_maker,
+    get_read_session_maker,
+)
 
 
 def get_user_service() -> UserService:
-    return UserService(UserSQLARepository, UserRedisRepository)
+    return UserService(UserSQLARepository, UserRedisRepository, SessionRedisRepository)
+
+
+async def get_read_session(
+    token: Annotated[str, Depends(JWTBearer())],
+    redis_session: Redis = Depends(get_session),
+    psql_session: AsyncSession = Depends(get_async_session),
+) -> AsyncSession:
+    """
+    Yields a read replica session, or the request's primary one
+    while the token owner's own writes may not have reached replicas yet.
+    """
+    session_maker = get_read_session_maker()
+    if session_maker is get_async_session_maker():
+        yield psql_session
+        return
+    email = get_unverified_email(token)
+    if email is None or await UserRedisRepository().is_pinned_to_primary(
+        redis_session, email
+    ):
+        yield psql_session
+        return
+    async with session_maker() as session:
+        yield session
@@ -1,12 +1,14 @@
 """Contains router for a base endpoints."""
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import JSONResponse
 from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import text
 
 from ..db.redis_config import get_session as redis_session
 from ..db.psql_config import get_async_session as psql_session
+from ..services.health import check_readiness
 from ..utils.app_loggers import get_logger
 
 
@@ -23,7 +25,7 @@ async def health_check_redis(session: Redis = Depends(redis_session)):
     try:
         await session.ping()
     except Exception as e:
-        logger.error(f"Redis's health check: FAILURE! Operational error: {e}")
+        logger.error("Redis's health check: FAILURE! Operational error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=f"Redis connection failed: {e}",
@@ -38,7 +40,7 @@ async def health_check_psql(session: AsyncSession = Depends(psql_session)):
     try:
         await session.execute(text("SELECT 1"))
     except Exception as e:
-        logger.error(f"PostgreSQL's health check: FAILURE! Operational error: {e}")
+        logger.error("PostgreSQL's health check: FAILURE! Operational error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=f"PostgreSQL connection failed: {e}",
@@ -47,5 +49,22 @@ async def health_check_psql(session: AsyncSession = Depends(psql_session)):
 
 
 @health_router.get("/app")
+@health_router.get("/live")
 async def health_check():
+    """Liveness check. Doesn't touch any dependency."""
     return response_ok
+
+
+@health_router.get("/ready")
+async def readiness_check():
+    """
+    Checks PostgreSQL, Redis and Auth0 JWKS concurrently, reports their latency
+    and the db pools' state. Responds 503 if PostgreSQL or Redis is unavailable.
+    """
+    result = await check_readiness()
+    return JSONResponse(
+        status_code=status.HTTP_200_OK
+        if result["ready"]
+        else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=result,
+    )
@@ -0,0 +1,15 @@
+"""Contains router for app's metrics."""
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from ..utils.metrics import metrics_registry
+
+
+metrics_router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+@metrics_router.get("/", response_class=PlainTextResponse)
+async def get_metrics():
+    """Returns worker's metrics in the Prometheus text format."""
+    return metrics_registry.render()
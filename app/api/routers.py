@@ -5,12 +5,14 @@ from fastapi import APIRouter
 from .auth import auth_router
 from .users import users_router
 from .health import health_router
+from .metrics import metrics_router
 
 
 routers = (
     auth_router,
     users_router,
     health_router,
+    metrics_router,
 )
 
 api_router = APIRouter(prefix="/api")
@@ -1,19 +1,27 @@
 """Contains endpoints for Users model."""
 
-from typing import Annotated
-from fastapi import APIRouter, Depends
+from typing import Annotated, List
+from fastapi import APIRouter, Depends, Query, Response
 from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.services.jwt_handler import JWTBearer
 
-from .dependencies import get_user_service
+from .dependencies import get_user_service, get_read_session
 from ..services.users import UserService
 from ..models.users import User
 from ..schemas.users import (
     SignUpRequestSchema,
+    UserPatchRequestSchema,
     UserSchema,
-    UsersListResponseSchema,
+    UsersBatchRequestSchema,
+    UsersBatchResponseSchema,
+    UsersCountResponseSchema,
+    UsersFilterSchema,
+    UsersListQuerySchema,
+    UserField,
+    UsersProjectionListResponseSchema,
+    UsersSearchResponseSchema,
     UserUpdateRequestSchema,
 )
 from ..db.redis_config import get_session
@@ -22,7 +30,11 @@ from ..utils.error_handlers import (
     filter_response_for_404_error,
     filter_response_for_409_error,
 )
-from ..services.user_permitions import check_ownership, check_user_update_permitions
+from ..services.user_permitions import (
+    check_ownership,
+    check_user_patch_permitions,
+    check_user_update_permitions,
+)
 
 
 users_router = APIRouter(prefix="/users", tags=["users"])
@@ -36,8 +48,11 @@ async def get_current_user(
     users_service: Annotated[UserService, Depends(get_user_service)],
     redis_session: Redis = Depends(get_session),
     psql_session: AsyncSession = Depends(psql_session),
+    psql_read_session: AsyncSession = Depends(get_read_session),
 ):
-    return await users_service.get_current_user(redis_session, psql_session, token)
+    return await users_service.get_current_user(
+        redis_session, psql_session, token, psql_read_session
+    )
 
 
 @users_router.post("/", response_model=UserSchema, status_code=201)
@@ -53,6 +68,69 @@ async def create_user(
     )
 
 
+@users_router.get("/search", response_model=UsersSearchResponseSchema)
+async def search_users(
+    token: Annotated[str, Depends(JWTBearer())],
+    users_service: Annotated[UserService, Depends(get_user_service)],
+    q: str = Query(min_length=1, max_length=255),
+    page: int = Query(1, ge=1),
+    size: int = Query(20, ge=1, le=100),
+    redis_session: Redis = Depends(get_session),
+    psql_session: AsyncSession = Depends(psql_session),
+    psql_read_session: AsyncSession = Depends(get_read_session),
+):
+    """Searches Users by a part of name, email or city. Best matches go first."""
+    current_user = await users_service.get_current_user_claims(
+        redis_session, psql_session, token, psql_read_session
+    )
+    check_ownership(current_user)
+    return await users_service.search_users(psql_read_session, q, page, size)
+
+
+@users_router.post("/batch", response_model=UsersBatchResponseSchema)
+async def get_users_batch(
+    batch_form: UsersBatchRequestSchema,
+    token: Annotated[str, Depends(JWTBearer())],
+    users_service: Annotated[UserService, Depends(get_user_service)],
+    redis_session: Redis = Depends(get_session),
+    psql_session: AsyncSession = Depends(psql_session),
+    psql_read_session: AsyncSession = Depends(get_read_session),
+):
+    """
+    Gets up to 100 Users by ids at once. Ids of absent Users
+    and of Users the current user has no access to are listed separately.
+    """
+    current_user = await users_service.get_current_user_claims(
+        redis_session, psql_session, token, psql_read_session
+    )
+    return await users_service.get_users_batch(
+        redis_session, psql_read_session, current_user, batch_form.ids
+    )
+
+
+@users_router.get("/count", response_model=UsersCountResponseSchema)
+async def count_users(
+    token: Annotated[str, Depends(JWTBearer())],
+    users_service: Annotated[UserService, Depends(get_user_service)],
+    filters: UsersFilterSchema = Depends(),
+    estimate: bool = Query(False),
+    redis_session: Redis = Depends(get_session),
+    psql_session: AsyncSession = Depends(psql_session),
+    psql_read_session: AsyncSession = Depends(get_read_session),
+):
+    """
+    Counts Users matching all given filters.
+    `estimate` returns planner statistics instead for an unfiltered count.
+    """
+    current_user = await users_service.get_current_user_claims(
+        redis_session, psql_session, token, psql_read_session
+    )
+    check_ownership(current_user)
+    return await users_service.count_users(
+        redis_session, psql_read_session, filters, estimate
+    )
+
+
 @users_router.get("/{id}", response_model=UserSchema)
 async def get_user(
     id: int,
@@ -60,29 +138,46 @@ async def get_user(
     users_service: Annotated[UserService, Depends(get_user_service)],
     redis_session: Redis = Depends(get_session),
     psql_session: AsyncSession = Depends(psql_session),
+    psql_read_session: AsyncSession = Depends(get_read_session),
 ):
-    current_user = await users_service.get_current_user(
-        redis_session, psql_session, token
+    current_user = await users_service.get_current_user_claims(
+        redis_session, psql_session, token, psql_read_session
     )
     check_ownership(current_user, id)
     return filter_response_for_404_error(
-        await users_service.get_user(redis_session, psql_session, id),
+        await users_service.get_user(redis_session, psql_read_session, id),
         User.__tablename__,
     )
 
 
-@users_router.get("/", response_model=UsersListResponseSchema)
+@users_router.get(
+    "/",
+    response_model=UsersProjectionListResponseSchema,
+    response_model_exclude_unset=True,
+)
 async def get_users(
     token: Annotated[str, Depends(JWTBearer())],
     users_service: Annotated[UserService, Depends(get_user_service)],
+    query: UsersListQuerySchema = Depends(),
+    fields: List[UserField] | None = Query(None),
     redis_session: Redis = Depends(get_session),
     psql_session: AsyncSession = Depends(psql_session),
+    psql_read_session: AsyncSession = Depends(get_read_session),
 ):
-    current_user = await users_service.get_current_user(
-        redis_session, psql_session, token
+    """
+    Lists Users matching all given filters, sorted by `sort_by` in `order`.
+    Repeated `fields` params limit the returned fields, `id` is always included.
+    """
+    current_user = await users_service.get_current_user_claims(
+        redis_session, psql_session, token, psql_read_session
     )
     check_ownership(current_user)
-    return await users_service.get_users(psql_session)
+    return Response(
+        await users_service.get_serialized_users(
+            redis_session, psql_read_session, query, fields
+        ),
+        media_type="application/json",
+    )
 
 
 @users_router.delete("/{id}", status_code=204)
@@ -93,12 +188,14 @@ async def delete_user(
     redis_session: Redis = Depends(get_session),
     psql_session: AsyncSession = Depends(psql_session),
 ):
-    current_user = await users_service.get_current_user(
+    current_user = await users_service.get_current_user_claims(
         redis_session, psql_session, token
     )
     check_ownership(current_user, id)
     return filter_response_for_404_error(
-        await users_service.delete_user(id, redis_session, psql_session),
+        await users_service.delete_user(
+            id, redis_session, psql_session, current_user["email"]
+        ),
         User.__tablename__,
         is_delete=True,
     )
@@ -118,6 +215,30 @@ async def update_user(
     )
     check_user_update_permitions(current_user, update_form, id)
     return filter_response_for_409_error(
-        await users_service.update_user(id, update_form, redis_session, psql_session),
+        await users_service.update_user(
+            id, update_form, redis_session, psql_session, current_user["email"]
+        ),
+        User.__tablename__,
+    )
+
+
+@users_router.patch("/{id}", response_model=UserSchema)
+async def patch_user(
+    id: int,
+    token: Annotated[str, Depends(JWTBearer())],
+    patch_form: UserPatchRequestSchema,
+    users_service: Annotated[UserService, Depends(get_user_service)],
+    redis_session: Redis = Depends(get_session),
+    psql_session: AsyncSession = Depends(psql_session),
+):
+    """Updates only the given fields of the User."""
+    current_user = await users_service.get_current_user(
+        redis_session, psql_session, token
+    )
+    check_user_patch_permitions(current_user, patch_form, id)
+    return filter_response_for_409_error(
+        await users_service.patch_user(
+            id, patch_form, redis_session, psql_session, current_user["email"]
+        ),
         User.__tablename__,
     )
@@ -1,6 +1,9 @@
 """Contains app related configuration code."""
 
-from functools import cache
+import os
+from functools import cache, cached_property
+from typing import Literal
+from pydantic import model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from passlib.context import CryptContext
 
@@ -10,8 +13,6 @@ class Settings(BaseSettings):
 
     model_config = SettingsConfigDict(env_file=".env")
 
-    pwd_context: CryptContext = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
     DEV: bool
 
     TZ: str
@@ -24,6 +25,8 @@ class Settings(BaseSettings):
 
     ALGORITHMS: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 14
+    ACCESS_TOKEN_EMBED_CLAIMS: bool = True
     DOMAIN: str
     API_AUDIENCE: str
     ISSUER: str
@@ -38,9 +41,84 @@ class Settings(BaseSettings):
     PSQL_TEST_DB: str
     PSQL_TEST_PORT: int
 
+    PSQL_REPLICA_URLS: list[str] = []
+    READ_YOUR_WRITES_WINDOW: int = 5
+
     REDIS_PASSWORD: str
     REDIS_HOST: str
     REDIS_PORT: int
+    REDIS_MODE: Literal["standalone", "sentinel", "cluster"] = "standalone"
+    REDIS_SENTINELS: list[str] = []
+    REDIS_SENTINEL_SERVICE: str = "mymaster"
+    REDIS_CONNECT_TIMEOUT: float = 0.5
+    REDIS_READ_TIMEOUT: float = 0.5
+    REDIS_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    REDIS_CIRCUIT_PROBE_INTERVAL: float = 2.0
+    REDIS_NEGATIVE_EXPIRATION_TIME: int = 30
+    REDIS_COUNT_EXPIRATION_TIME: int = 10
+    REDIS_LIST_EXPIRATION_TIME: int = 60
+
+    CACHE_WARMUP_ENABLED: bool = True
+    CACHE_WARMUP_LIMIT: int = 10000
+    CACHE_WARMUP_ACTIVE_DAYS: int = 7
+    CACHE_WARMUP_BATCH_SIZE: int = 500
+    CACHE_WARMUP_BATCH_DELAY: float = 0.1
+
+    CACHE_BACKGROUND_WRITES: bool = False
+    CACHE_BACKGROUND_CONCURRENCY: int = 32
+    CACHE_BACKGROUND_MAX_PENDING: int = 1000
+
+    PASSWORD_HASH_SCHEMES: list[str] = ["bcrypt"]
+    PASSWORD_HASH_ROUNDS: int | None = None
+
+    LOGIN_RATE_LIMIT_ENABLED: bool = True
+    LOGIN_RATE_LIMIT_IP_CAPACITY: int = 20
+    LOGIN_RATE_LIMIT_IP_PER_MINUTE: float = 10
+    LOGIN_RATE_LIMIT_EMAIL_CAPACITY: int = 5
+    LOGIN_RATE_LIMIT_EMAIL_PER_MINUTE: float = 1
+
+    LOG_QUEUE_ENABLED: bool = True
+    LOG_FORMAT: str = "text"
+    LOG_SAMPLING: dict[str, float] = {}
+
+    HEALTH_CHECK_TIMEOUT: float = 1.0
+    HEALTH_READY_CACHE_TTL: float = 2.0
+
+    WORKERS: int | None = None
+    SERVER_LOOP: str = "uvloop"
+    SERVER_HTTP: str = "httptools"
+    GRACEFUL_SHUTDOWN_TIMEOUT: int = 30
+    # Connections all workers of one app instance may open to each db and to Redis.
+    PSQL_CONNECTION_BUDGET: int = 40
+    REDIS_CONNECTION_BUDGET: int = 200
+    REDIS_POOL_TIMEOUT: float = 5.0
+
+    @model_validator(mode="after")
+    def check_connection_budgets(self) -> "Settings":
+        """Every worker's pools need at least one connection of each budget."""
+        budget = min(self.PSQL_CONNECTION_BUDGET, self.REDIS_CONNECTION_BUDGET)
+        if budget < 1:
+            raise ValueError("Connection budgets must allow at least one connection.")
+        if not self.DEV and self.WORKERS is not None and self.WORKERS > budget:
+            raise ValueError(
+                f"WORKERS={self.WORKERS} would exceed the connection budget of {budget}."
+            )
+        return self
+
+    @cached_property
+    def pwd_context(self) -> CryptContext:
+        """
+        The first scheme hashes new passwords, the rest are only verified.
+        Hashes made with other schemes or rounds are marked as needing an update.
+        """
+        scheme = self.PASSWORD_HASH_SCHEMES[0]
+        rounds_options = {}
+        if self.PASSWORD_HASH_ROUNDS is not None:
+            for option in ("rounds", "min_rounds", "max_rounds"):
+                rounds_options[f"{scheme}__{option}"] = self.PASSWORD_HASH_ROUNDS
+        return CryptContext(
+            schemes=self.PASSWORD_HASH_SCHEMES, deprecated="auto", **rounds_options
+        )
 
     @property
     def SECRET_KEY_PRIVATE(self):
@@ -54,6 +132,32 @@ class Settings(BaseSettings):
         with open("/.ssh/id_rsa.pub.jwk", "rb") as file:
             return file.read()
 
+    @property
+    def workers_count(self) -> int:
+        """
+        One worker in DEV mode, otherwise `WORKERS` or every CPU available to the process,
+        but no more than the connection budgets have connections for.
+        """
+        if self.DEV:
+            return 1
+        if self.WORKERS is not None:
+            return self.WORKERS
+        if hasattr(os, "sched_getaffinity"):
+            cpus = len(os.sched_getaffinity(0))
+        else:
+            cpus = os.cpu_count() or 1
+        return min(cpus, self.PSQL_CONNECTION_BUDGET, self.REDIS_CONNECTION_BUDGET)
+
+    @property
+    def psql_pool_size(self) -> int:
+        """Worker's share of `PSQL_CONNECTION_BUDGET`. Pools don't overflow it."""
+        return self.PSQL_CONNECTION_BUDGET // self.workers_count
+
+    @property
+    def redis_max_connections(self) -> int:
+        """Worker's share of `REDIS_CONNECTION_BUDGET`."""
+        return self.REDIS_CONNECTION_BUDGET // self.workers_count
+
     @property
     def REDIS_EXPIRATION_TIME(self) -> int:
         if {self.DEV} is True:
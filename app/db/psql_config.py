@@ -1,9 +1,16 @@
-"""Contains Postgresql-related configs and tools."""
+"""
+Contains Postgresql-related configs and tools.
 
+Engines are created on first use, not on import, and disposed by the app's lifespan.
+"""
+
+from functools import cache
+from itertools import count
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.ext.asyncio import (
     create_async_engine,
     async_sessionmaker,
+    AsyncEngine,
     AsyncSession,
 )
 
@@ -11,18 +18,106 @@ from ..core.settings import get_settings
 
 
 settings = get_settings()
-async_engine = create_async_engine(
-    url=settings.get_psql_url,
-    echo=settings.DEV,
-    future=True,
-)
-async_session_maker = async_sessionmaker(
-    async_engine, class_=AsyncSession, expire_on_commit=False
-)
+_replica_counter = count()
+
+
+@cache
+def get_async_engine() -> AsyncEngine:
+    return create_async_engine(
+        url=settings.get_psql_url,
+        echo=settings.DEV,
+        future=True,
+        pool_size=settings.psql_pool_size,
+        max_overflow=0,
+    )
+
+
+@cache
+def get_async_session_maker() -> async_sessionmaker:
+    return async_sessionmaker(
+        get_async_engine(), class_=AsyncSession, expire_on_commit=False
+    )
+
+
+@cache
+def get_replica_engines() -> tuple[AsyncEngine, ...]:
+    return tuple(
+        create_async_engine(
+            url=url,
+            echo=settings.DEV,
+            future=True,
+            pool_size=settings.psql_pool_size,
+            max_overflow=0,
+        )
+        for url in settings.PSQL_REPLICA_URLS
+    )
+
+
+@cache
+def get_replica_session_makers() -> tuple[async_sessionmaker, ...]:
+    return tuple(
+        async_sessionmaker(
+            engine,
+            class_=AsyncSession,
+            expire_on_commit=False,
+            info={"read_replica": True},
+        )
+        for engine in get_replica_engines()
+    )
+
+
+def is_read_replica(session: AsyncSession) -> bool:
+    """Replicas may lag behind the primary, so their answers aren't authoritative."""
+    return session.info.get("read_replica", False)
+
+
+def get_read_session_maker() -> async_sessionmaker:
+    """Returns the next replica's session maker, or the primary's without replicas."""
+    replica_session_makers = get_replica_session_makers()
+    if replica_session_makers:
+        return replica_session_makers[
+            next(_replica_counter) % len(replica_session_makers)
+        ]
+    return get_async_session_maker()
+
+
+async def dispose_engines() -> None:
+    """Closes pooled connections of the engines created so far."""
+    if get_async_engine.cache_info().currsize:
+        await get_async_engine().dispose()
+    if get_replica_engines.cache_info().currsize:
+        for engine in get_replica_engines():
+            await engine.dispose()
+    for getter in (
+        get_async_engine,
+        get_async_session_maker,
+        get_replica_engines,
+        get_replica_session_makers,
+    ):
+        getter.cache_clear()
+
+
+_lazy_attributes = {
+    "async_engine": get_async_engine,
+    "async_session_maker": get_async_session_maker,
+    "replica_engines": get_replica_engines,
+    "replica_session_makers": get_replica_session_makers,
+}
+
+
+def __getattr__(name: str):
+    """Keeps engines and session makers importable by name."""
+    if name in _lazy_attributes:
+        return _lazy_attributes[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 async def get_async_session() -> AsyncSession:
-    async with async_session_maker() as session:
+    """
+    The session checks out a pooled connection only on its first query,
+    so requests served from Redis never hold one.
+    """
+    async with get_async_session_maker()() as session:
         yield session
 
 
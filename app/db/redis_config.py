@@ -1,17 +1,152 @@
 """Contains Redis-related configs and tools."""
 
-from redis.asyncio import Redis
+from contextlib import asynccontextmanager
+from functools import cache
+from typing import AsyncIterator
+from redis.asyncio import BlockingConnectionPool, ConnectionPool, Redis
+from redis.asyncio.cluster import RedisCluster
+from redis.asyncio.sentinel import Sentinel, SentinelConnectionPool
+from redis.commands.core import AsyncScript
 
 from ..core.settings import get_settings
+from ..utils.circuit_breaker import CircuitBreaker
 
 
 settings = get_settings()
 
+# Guards the cache layer, see `RedisRepository`.
+redis_circuit_breaker = CircuitBreaker(
+    "redis",
+    settings.REDIS_CIRCUIT_FAILURE_THRESHOLD,
+    settings.REDIS_CIRCUIT_PROBE_INTERVAL,
+)
 
-async def get_session() -> Redis:
-    async with Redis(
+
+class BlockingSentinelConnectionPool(SentinelConnectionPool, BlockingConnectionPool):
+    """Sentinel pool that waits for a free connection like the standalone one."""
+
+
+def _parse_address(address: str) -> tuple[str, int]:
+    host, _, port = address.rpartition(":")
+    return host, int(port)
+
+
+def _get_timeouts() -> dict:
+    return {
+        "socket_connect_timeout": settings.REDIS_CONNECT_TIMEOUT,
+        "socket_timeout": settings.REDIS_READ_TIMEOUT,
+    }
+
+
+@cache
+def get_redis_pool() -> ConnectionPool:
+    """
+    Returns the worker's connection pool, capped at its share of connections.
+    Callers wait up to `REDIS_POOL_TIMEOUT` seconds for a free connection.
+    In sentinel mode connections go to the current master, found via `REDIS_SENTINELS`.
+    """
+    if settings.REDIS_MODE == "sentinel":
+        sentinel = Sentinel(
+            [_parse_address(address) for address in settings.REDIS_SENTINELS],
+            sentinel_kwargs={"password": settings.REDIS_PASSWORD, **_get_timeouts()},
+        )
+        return BlockingSentinelConnectionPool(
+            settings.REDIS_SENTINEL_SERVICE,
+            sentinel,
+            password=settings.REDIS_PASSWORD,
+            max_connections=settings.redis_max_connections,
+            timeout=settings.REDIS_POOL_TIMEOUT,
+            **_get_timeouts(),
+        )
+    return BlockingConnectionPool(
         password=settings.REDIS_PASSWORD,
         host=settings.REDIS_HOST,
         port=settings.REDIS_PORT,
-    ) as session:
+        max_connections=settings.redis_max_connections,
+        timeout=settings.REDIS_POOL_TIMEOUT,
+        **_get_timeouts(),
+    )
+
+
+@cache
+def get_redis_cluster() -> RedisCluster:
+    """Returns the worker's cluster client, which keeps a pool per node."""
+    return RedisCluster(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        password=settings.REDIS_PASSWORD,
+        max_connections=settings.redis_max_connections,
+        **_get_timeouts(),
+    )
+
+
+def is_cluster_client(redis_session: Redis | RedisCluster) -> bool:
+    """
+    Cluster clients can't run transactions or multi-key commands across slots,
+    so callers fall back to plain pipelines and per-node MGETs.
+    """
+    return isinstance(redis_session, RedisCluster)
+
+
+async def mget(redis_session: Redis | RedisCluster, keys: list[str]) -> list:
+    """MGET of keys that may live in different cluster slots."""
+    if is_cluster_client(redis_session):
+        return await redis_session.mget_nonatomic(keys)
+    return await redis_session.mget(keys)
+
+
+def create_script(script: str) -> AsyncScript:
+    """
+    Returns a Lua script to create once per module and call with `client=`.
+    It's run by its hash and loaded on the first NOSCRIPT error of a server.
+    """
+    return AsyncScript(None, script.encode())
+
+
+def get_redis_client() -> Redis:
+    """Closing the client returns its connection to the shared pool."""
+    return Redis(connection_pool=get_redis_pool())
+
+
+@cache
+def get_shared_redis_client() -> Redis | RedisCluster:
+    """Returns a client kept for the worker's lifetime, for work outside requests."""
+    if settings.REDIS_MODE == "cluster":
+        return get_redis_cluster()
+    return get_redis_client()
+
+
+async def _ping_shared_redis_client() -> None:
+    await get_shared_redis_client().ping()
+
+
+redis_circuit_breaker.add_probe_step(_ping_shared_redis_client)
+
+
+async def close_shared_redis_client() -> None:
+    """Closes the shared client and disconnects the worker's pool."""
+    if get_shared_redis_client.cache_info().currsize:
+        await get_shared_redis_client().close()
+        get_shared_redis_client.cache_clear()
+        get_redis_cluster.cache_clear()
+    if get_redis_pool.cache_info().currsize:
+        await get_redis_pool().disconnect()
+        get_redis_pool.cache_clear()
+
+
+@asynccontextmanager
+async def open_redis_session() -> AsyncIterator[Redis | RedisCluster]:
+    """
+    Yields a client for a unit of work. The cluster client discovers the topology
+    on start, so instead of a client per unit of work the shared one is reused.
+    """
+    if settings.REDIS_MODE == "cluster":
+        yield get_shared_redis_client()
+        return
+    async with get_redis_client() as session:
+        yield session
+
+
+async def get_session() -> Redis | RedisCluster:
+    async with open_redis_session() as session:
         yield session
@@ -1,28 +1,134 @@
 """Contains main app initialization."""
-import uvicorn
+from time import perf_counter
+
+_import_started_at = perf_counter()
+
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from .core.settings import get_settings
 from .api.routers import api_router
+from .api.dependencies import get_user_service
+from .db.psql_config import dispose_engines, get_async_engine, get_replica_engines
+from .db.redis_config import (
+    close_shared_redis_client,
+    get_shared_redis_client,
+    redis_circuit_breaker,
+)
+from .services.background import background_cache_writer
+from .services.cache_warmup import run_cache_warmup
+from .utils.app_loggers import get_logger, setup_queue_logging
+from .utils.metrics import metrics_registry
 
 
 settings = get_settings()
-app = FastAPI(debug=settings.DEV)
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=settings.CORS_ORIGINS,
-    allow_credentials=True,
-    allow_methods=["GET, POST, PUT, DELETE, OPTIONS"],
-    allow_headers=settings.CORS_HEADERS,
+logger = get_logger(__name__)
+
+startup_phase_seconds = metrics_registry.gauge(
+    "startup_phase_seconds", "Duration of the worker's startup phases."
 )
-app.include_router(api_router)
+startup_phase_seconds.set(perf_counter() - _import_started_at, phase="import")
 
-if __name__ == "__main__":
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Owns the worker's db engines and shared Redis client."""
+    started_at = perf_counter()
+    log_listener = None
+    if settings.LOG_QUEUE_ENABLED:
+        log_listener = setup_queue_logging(settings.LOG_FORMAT, settings.LOG_SAMPLING)
+    get_async_engine()
+    get_replica_engines()
+    get_shared_redis_client()
+    cache_warmup_task = None
+    if settings.CACHE_WARMUP_ENABLED:
+        cache_warmup_task = asyncio.create_task(run_cache_warmup(get_user_service()))
+    startup_phase_seconds.set(perf_counter() - started_at, phase="lifespan")
+    logger.info(
+        "Worker started in %.3fs: import %.3fs, app creation %.3fs, lifespan %.3fs.",
+        sum(startup_phase_seconds.values.values()),
+        startup_phase_seconds.get(phase="import"),
+        startup_phase_seconds.get(phase="app_creation"),
+        startup_phase_seconds.get(phase="lifespan"),
+    )
+    yield
+    if cache_warmup_task is not None:
+        cache_warmup_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await cache_warmup_task
+    await background_cache_writer.drain(settings.GRACEFUL_SHUTDOWN_TIMEOUT)
+    await redis_circuit_breaker.stop()
+    await dispose_engines()
+    await close_shared_redis_client()
+    if log_listener is not None:
+        log_listener.stop()
+
+
+def create_app() -> FastAPI:
+    started_at = perf_counter()
+    app = FastAPI(debug=settings.DEV, lifespan=lifespan)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=settings.CORS_ORIGINS,
+        allow_credentials=True,
+        allow_methods=["GET, POST, PUT, DELETE, OPTIONS"],
+        allow_headers=settings.CORS_HEADERS,
+    )
+    app.include_router(api_router)
+    startup_phase_seconds.set(perf_counter() - started_at, phase="app_creation")
+    return app
+
+
+_app = None
+
+
+def __getattr__(name: str):
+    """Creates `app` on first access, e.g. when uvicorn loads `app.main:app`."""
+    global _app
+    if name == "app":
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def run() -> None:
+    """
+    Runs uvicorn: a single reloading process in DEV mode, otherwise `workers_count`
+    workers with the configured event loop and HTTP parser. On SIGTERM workers stop
+    accepting connections and get `GRACEFUL_SHUTDOWN_TIMEOUT` seconds to finish requests.
+    """
+    import uvicorn
+
+    if settings.DEV:
+        uvicorn.run(
+            app=settings.APP_NAME,
+            host=settings.APP_HOST,
+            port=settings.APP_PORT,
+            reload=True,
+            log_config="logging.conf",
+        )
+        return
+    logger.info(
+        "Starting %s workers with %s psql and %s Redis connections each.",
+        settings.workers_count,
+        settings.psql_pool_size,
+        settings.redis_max_connections,
+    )
     uvicorn.run(
         app=settings.APP_NAME,
         host=settings.APP_HOST,
         port=settings.APP_PORT,
-        reload=settings.DEV,
+        workers=settings.workers_count,
+        loop=settings.SERVER_LOOP,
+        http=settings.SERVER_HTTP,
+        timeout_graceful_shutdown=settings.GRACEFUL_SHUTDOWN_TIMEOUT,
         log_config="logging.conf",
     )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,38 @@
+"""Add trigram search indexes on User.
+
+Revision ID: 9b1e4c2d7a10
+Revises: 576c8c8c3637
+Create Date: 2026-10-19 14:30:12.402114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b1e4c2d7a10'
+down_revision: Union[str, None] = '576c8c8c3637'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+search_fields = ('firstname', 'lastname', 'email', 'city')
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for field in search_fields:
+        op.create_index(
+            f'ix_User_{field}_trgm',
+            'User',
+            [field],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_ops={field: 'gin_trgm_ops'},
+        )
+
+
+def downgrade() -> None:
+    for field in search_fields:
+        op.drop_index(f'ix_User_{field}_trgm', table_name='User')
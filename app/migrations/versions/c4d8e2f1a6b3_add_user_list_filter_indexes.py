@@ -0,0 +1,48 @@
+"""Add User list filter and sort indexes.
+
+Revision ID: c4d8e2f1a6b3
+Revises: 9b1e4c2d7a10
+Create Date: 2026-10-19 16:05:41.118532
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d8e2f1a6b3'
+down_revision: Union[str, None] = '9b1e4c2d7a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_User_city', 'User', ['city'], unique=False)
+    op.create_index('ix_User_created_at', 'User', ['created_at'], unique=False)
+    op.create_index(
+        'ix_User_lower_email', 'User', [sa.text('lower(email)')], unique=False
+    )
+    op.create_index(
+        'ix_User_inactive',
+        'User',
+        ['id'],
+        unique=False,
+        postgresql_where=sa.text('NOT is_active'),
+    )
+    op.create_index(
+        'ix_User_superuser',
+        'User',
+        ['id'],
+        unique=False,
+        postgresql_where=sa.text('is_superuser'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_User_superuser', table_name='User')
+    op.drop_index('ix_User_inactive', table_name='User')
+    op.drop_index('ix_User_lower_email', table_name='User')
+    op.drop_index('ix_User_created_at', table_name='User')
+    op.drop_index('ix_User_city', table_name='User')
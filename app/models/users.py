@@ -2,7 +2,7 @@
 
 from datetime import datetime
 from typing import List
-from sqlalchemy import String, DateTime, Boolean, ARRAY
+from sqlalchemy import String, DateTime, Boolean, ARRAY, Index, text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from ..db.psql_config import Base
@@ -12,6 +12,24 @@ class User(Base):
     """Sqlachemy model."""
 
     __tablename__ = "User"
+    __table_args__ = (
+        *(
+            Index(
+                f"ix_User_{field}_trgm",
+                field,
+                postgresql_using="gin",
+                postgresql_ops={field: "gin_trgm_ops"},
+            )
+            for field in ("firstname", "lastname", "email", "city")
+        ),
+        Index("ix_User_city", "city"),
+        Index("ix_User_created_at", "created_at"),
+        Index("ix_User_lower_email", text("lower(email)")),
+        # Partial indexes cover the rare side of boolean filters only,
+        # the common side is cheaper to read with a sequential scan.
+        Index("ix_User_inactive", "id", postgresql_where=text("NOT is_active")),
+        Index("ix_User_superuser", "id", postgresql_where=text("is_superuser")),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     email: Mapped[str] = mapped_column(String(255), unique=True, nullable=False)
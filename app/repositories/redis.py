@@ -1,17 +1,228 @@
+import asyncio
+from collections import defaultdict
+from functools import wraps
 from json import loads, dumps
+from time import time_ns
+from typing import Any, Callable
 from redis.asyncio import Redis
+from redis.exceptions import RedisError
 
+from ..db.redis_config import (
+    create_script,
+    get_shared_redis_client,
+    is_cluster_client,
+    mget,
+    redis_circuit_breaker,
+)
 from ..utils.app_loggers import get_logger
+from ..utils.circuit_breaker import CircuitOpenError
 from ..core.settings import get_settings
 from .base import AbstractRepository
-from ..models.users import User
 
 
 settings = get_settings()
 logger = get_logger(__name__)
 
+# Returned by `find_one` when the record is known to be absent from the db.
+CACHED_MISS = object()
+
+# Errors of cache calls, raised by writes so callers can tell a write was lost.
+CACHE_ERRORS = (RedisError, OSError, CircuitOpenError)
+
+# (id, email) of records whose cache writes were skipped or failed, by repository
+# class. They are evicted by the next cache call reaching Redis, or by the probe
+# before the circuit breaker closes, so no stale copy or cached miss is served.
+_missed_writes: dict[type, set[tuple[int, str | None]]] = defaultdict(set)
+_eviction: asyncio.Task | None = None
+
+
+async def _evict_missed_writes_once() -> None:
+    """Concurrent cache calls wait for one eviction instead of running their own."""
+    global _eviction
+    if _eviction is None or _eviction.done():
+        _eviction = asyncio.create_task(_evict_missed_writes())
+    await asyncio.shield(_eviction)
+
+
+def _guarded(default: Any = None):
+    """
+    Skips the cache read while `redis_circuit_breaker` is open and turns its failures
+    into `default` (called with the call's arguments if callable), so callers
+    fall back to the db instead of failing. Missed writes are evicted first.
+    """
+
+    def decorator(method):
+        @wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            if not redis_circuit_breaker.is_open:
+                try:
+                    if _missed_writes:
+                        await _evict_missed_writes_once()
+                    result = await method(self, *args, **kwargs)
+                    redis_circuit_breaker.record_success()
+                    return result
+                except (RedisError, OSError) as e:
+                    logger.warning("%s cache call failed: %s", method.__name__, e)
+                    redis_circuit_breaker.record_failure(e)
+            else:
+                redis_circuit_breaker.record_skip(method.__name__)
+            return default(*args, **kwargs) if callable(default) else default
+
+        return wrapper
+
+    return decorator
+
+
+def _guarded_write(
+    written_records: Callable[..., list[tuple[int, str | None]]] | None = None
+):
+    """
+    Skips the cache write while `redis_circuit_breaker` is open, raising
+    `CircuitOpenError`, and counts its failures, raising them too, so callers
+    can account for a lost write. `written_records` returns (id, email) of records
+    the call replaces or invalidates, remembered on a skip or failure.
+    """
+
+    def decorator(method):
+        @wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            if not redis_circuit_breaker.is_open:
+                try:
+                    if _missed_writes:
+                        await _evict_missed_writes_once()
+                    result = await method(self, *args, **kwargs)
+                    redis_circuit_breaker.record_success()
+                    return result
+                except (RedisError, OSError) as e:
+                    logger.warning("%s cache call failed: %s", method.__name__, e)
+                    redis_circuit_breaker.record_failure(e)
+                    error = e
+            else:
+                redis_circuit_breaker.record_skip(method.__name__)
+                error = CircuitOpenError(redis_circuit_breaker.name)
+            if written_records is not None:
+                _missed_writes[type(self)].update(written_records(*args, **kwargs))
+            raise error
+
+        return wrapper
+
+    return decorator
+
+
+def _get_written_records(
+    data: dict | list | tuple | None,
+    redis_session: Redis | None = None,
+    only_if_absent: bool = False,
+) -> list[tuple[int, str | None]]:
+    # A lost fill leaves no stale copy behind, there is nothing to evict.
+    if only_if_absent:
+        return []
+    if isinstance(data, dict):
+        return [(data["id"], data.get("email"))]
+    if isinstance(data, list):
+        return [(item["id"], item.get("email")) for item in data]
+    return []
+
+
+# KEYS[1] - record key or email pointer key; KEYS[2] - its negative cache key.
+# Returns the record (or the pointed id), 0 for a cached miss or nil.
+FIND_SCRIPT = create_script(
+    """
+local data = redis.call('GET', KEYS[1])
+if data then
+    return data
+end
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    return 0
+end
+return false
+"""
+)
+
+# KEYS[1] - email pointer key; KEYS[2] - its negative cache key; ARGV[1] - model name.
+# Returns the pointed record, 0 for a cached miss or nil. The record key is built
+# from the pointer as `_get_key` does, so the script isn't run on a cluster.
+FIND_BY_EMAIL_SCRIPT = create_script(
+    """
+local id = redis.call('GET', KEYS[1])
+if id then
+    return redis.call('GET', ARGV[1] .. ':{' .. id .. '}')
+end
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    return 0
+end
+return false
+"""
+)
+
+# KEYS - ARGV[2] record keys followed by other keys to unlink; ARGV[1] - model name.
+# Unlinks KEYS with email pointers and their negative cache keys, built from
+# the records' emails as `_get_email_key` and `_get_miss_key` do, so the script
+# isn't run on a cluster. Returns the number of deleted records.
+DELETE_SCRIPT = create_script(
+    """
+local keys = {}
+local deleted = 0
+for i = 1, tonumber(ARGV[2]) do
+    local data = redis.call('GET', KEYS[i])
+    if data then
+        deleted = deleted + 1
+        local email = cjson.decode(data)['email']
+        if type(email) == 'string' then
+            table.insert(keys, ARGV[1] .. ':email:{' .. email .. '}')
+            table.insert(keys, ARGV[1] .. ':miss:email:{' .. email .. '}')
+        end
+    end
+end
+for _, key in ipairs(KEYS) do
+    table.insert(keys, key)
+end
+for i = 1, #keys, 1000 do
+    redis.call('UNLINK', unpack(keys, i, math.min(i + 999, #keys)))
+end
+return deleted
+"""
+)
+
+# Sets the negative cache key KEYS[2] for ARGV[1] seconds unless the record
+# or email pointer KEYS[1] exists, i.e. the record was created after the db miss.
+ADD_MISS_SCRIPT = create_script(
+    """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    redis.call('SET', KEYS[2], 1, 'EX', ARGV[1])
+end
+"""
+)
+
+# Returns the permissions version in KEYS[1], setting it to ARGV[1] if absent,
+# and keeps it for ARGV[2] seconds more, so it outlives tokens issued with it.
+ISSUE_PERMISSIONS_VERSION_SCRIPT = create_script(
+    """
+local version = redis.call('GET', KEYS[1])
+if not version then
+    version = ARGV[1]
+    redis.call('SET', KEYS[1], version, 'EX', ARGV[2])
+else
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return version
+"""
+)
+
 
 class RedisRepository(AbstractRepository):
+    """
+    Caches records as JSON under `<model_name>:{<id>}` keys.
+
+    Records with an email also get a `<model_name>:email:{<email>}` pointer to the id,
+    so both lookups take a single round trip without key scanning.
+    Lookups that missed the db are remembered for a short time under `<model_name>:miss:` keys.
+
+    Hash tags keep a key and its miss key in one cluster slot. A pointer and its record
+    are tagged by different values, so on a cluster lookups by email take two round trips
+    and deletes read records before unlinking them; elsewhere one script does either.
+    """
+
     schema = None
     model_name = None
 
@@ -25,71 +236,321 @@ class RedisRepository(AbstractRepository):
     def _convert_cached_data_to_dict(cashed_data: bytes) -> dict:
         return loads(cashed_data.decode())
 
-    async def _get_redis_key_pattern_for_user(
-        self, redis_session: Redis, id: int | None, email: str | None = None
-    ) -> str | None:
-        id = id or "*"
-        email = email or "*"
-        redis_key_pattern = await redis_session.scan(
-            match=f"{self.model_name}:{id}:{email}"
-        )
-        if len(redis_key_pattern[1]) > 0:
-            return redis_key_pattern[1][0]
+    def _get_key(self, id: int | str) -> str:
+        return f"{self.model_name}:{{{id}}}"
 
-    async def _get_redis_key_pattern(
-        self,
-        redis_session: Redis,
-        id: int | None,
-        email: str | None = None,
-        is_adding: bool = False,
-    ):
-        if self.model_name == User.__tablename__:
-            if is_adding is True:
-                return f"{self.model_name}:{id}:{email}"
-            else:
-                return await self._get_redis_key_pattern_for_user(
-                    redis_session, id, email
-                )
-        return f"{self.model_name}:{id}"
+    def _get_email_key(self, email: str) -> str:
+        return f"{self.model_name}:email:{{{email}}}"
 
+    def _get_miss_key(self, id: int | None, email: str | None = None) -> str:
+        if id is not None:
+            return f"{self.model_name}:miss:{{{id}}}"
+        return f"{self.model_name}:miss:email:{{{email}}}"
+
+    def _set_in_pipeline(self, pipe, data: dict, only_if_absent: bool = False) -> None:
+        pipe.unlink(self._get_miss_key(data["id"]))
+        if data.get("email") is not None:
+            pipe.unlink(self._get_miss_key(None, data["email"]))
+        pipe.set(
+            self._get_key(data["id"]),
+            self._convert_to_json_dict(data, self.schema),
+            ex=settings.REDIS_EXPIRATION_TIME,
+            nx=only_if_absent,
+        )
+        if data.get("email") is not None:
+            pipe.set(
+                self._get_email_key(data["email"]),
+                data["id"],
+                ex=settings.REDIS_EXPIRATION_TIME,
+                nx=only_if_absent,
+            )
+
+    @_guarded()
     async def find_one(
         self,
         redis_session: Redis,
         id: int | None,
         email: str | None = None,
-    ) -> dict | None:
-        key_pattern = await self._get_redis_key_pattern(redis_session, id, email)
-        if key_pattern is not None:
-            data = await redis_session.get(key_pattern)
-            if data is not None:
-                data = self._convert_cached_data_to_dict(data)
-                logger.info(f"{self.model_name}'s data was taken from Redis.")
+    ) -> dict | object | None:
+        """Returns cached record, `CACHED_MISS` for a known absent one or None."""
+        if id is not None:
+            data = await FIND_SCRIPT(
+                keys=[self._get_key(id), self._get_miss_key(id)], client=redis_session
+            )
+        elif email is None:
+            return None
+        elif is_cluster_client(redis_session):
+            data = await FIND_SCRIPT(
+                keys=[self._get_email_key(email), self._get_miss_key(None, email)],
+                client=redis_session,
+            )
+            if data:
+                data = await redis_session.get(self._get_key(data.decode()))
+        else:
+            data = await FIND_BY_EMAIL_SCRIPT(
+                keys=[self._get_email_key(email), self._get_miss_key(None, email)],
+                args=[self.model_name],
+                client=redis_session,
+            )
+        if data == 0:
+            logger.info("%s's absence was taken from Redis.", self.model_name)
+            return CACHED_MISS
+        if data is not None:
+            data = self._convert_cached_data_to_dict(data)
+            if email is None or data.get("email") == email:
+                logger.info("%s's data was taken from Redis.", self.model_name)
                 return data
 
+    @_guarded_write()
+    async def add_miss(
+        self, redis_session: Redis, id: int | None, email: str | None = None
+    ) -> None:
+        """Remembers that the db has no record with the id or email."""
+        key = self._get_key(id) if id is not None else self._get_email_key(email)
+        await ADD_MISS_SCRIPT(
+            keys=[key, self._get_miss_key(id, email)],
+            args=[settings.REDIS_NEGATIVE_EXPIRATION_TIME],
+            client=redis_session,
+        )
+
+    @_guarded(default=lambda redis_session, ids: [None] * len(ids))
+    async def find_many(
+        self, redis_session: Redis, ids: list[int]
+    ) -> list[dict | None]:
+        """Returns cached records in the order of `ids`, None for misses."""
+        if not ids:
+            return []
+        cached_data = await mget(redis_session, [self._get_key(id) for id in ids])
+        result = [
+            self._convert_cached_data_to_dict(data) if data is not None else None
+            for data in cached_data
+        ]
+        logger.info(
+            "%s %s's records were taken from Redis.",
+            len(ids) - result.count(None),
+            self.model_name,
+        )
+        return result
+
+    @_guarded_write(written_records=_get_written_records)
     async def add_one(
         self,
         data: dict | tuple | None,
         redis_session: Redis,
+        only_if_absent: bool = False,
     ) -> None:
+        """
+        `only_if_absent` keeps a cached record, so a copy read from the db earlier
+        never replaces one written by a concurrent update.
+        """
         if data is None or isinstance(data, tuple):
             return
-        await redis_session.set(
-            await self._get_redis_key_pattern(
-                redis_session, data["id"], data["email"], is_adding=True
-            ),
-            self._convert_to_json_dict(data, self.schema),
-            ex=settings.REDIS_EXPIRATION_TIME,
+        async with redis_session.pipeline(
+            transaction=not is_cluster_client(redis_session)
+        ) as pipe:
+            self._set_in_pipeline(pipe, data, only_if_absent)
+            await pipe.execute()
+        logger.info("%s's data was inserted in Redis.", self.model_name)
+
+    @_guarded_write(written_records=_get_written_records)
+    async def add_many(
+        self, data: list[dict], redis_session: Redis, only_if_absent: bool = False
+    ) -> None:
+        if not data:
+            return
+        async with redis_session.pipeline(
+            transaction=not is_cluster_client(redis_session)
+        ) as pipe:
+            for item in data:
+                self._set_in_pipeline(pipe, item, only_if_absent)
+            await pipe.execute()
+        logger.info(
+            "%s %s's records were inserted in Redis.", len(data), self.model_name
         )
-        logger.info(f"{self.model_name}'s data was inserted in Redis.")
 
     async def delete_one(
         self, data: dict | tuple | None, id: int, redis_session: Redis
     ) -> None:
-        key_pattern = await self._get_redis_key_pattern(redis_session, id)
-        if key_pattern is not None:
-            if isinstance(data, int):
-                await redis_session.delete(key_pattern)
-                logger.info(f"{self.model_name}'s data was deleted from Redis.")
+        if isinstance(data, int):
+            await self.delete_many([id], redis_session)
+
+    @_guarded_write(
+        written_records=lambda ids, redis_session, emails=None: [
+            (id, None) for id in ids
+        ]
+    )
+    async def delete_many(
+        self, ids: list[int], redis_session: Redis, emails: list[str] | None = None
+    ) -> int:
+        """
+        Unlinks records with their negative cache keys, and email pointers with theirs
+        for emails read from the records or given in `emails`, e.g. of uncached records.
+        """
+        if not ids and not emails:
+            return 0
+        keys = [self._get_key(id) for id in ids]
+        other_keys = [self._get_miss_key(id) for id in ids]
+        for email in emails or ():
+            other_keys.extend(
+                (self._get_email_key(email), self._get_miss_key(None, email))
+            )
+        if not is_cluster_client(redis_session):
+            deleted = await DELETE_SCRIPT(
+                keys=keys + other_keys,
+                args=[self.model_name, len(keys)],
+                client=redis_session,
+            )
+        else:
+            deleted = await self._delete_many_in_cluster(
+                keys, other_keys, redis_session
+            )
+        if deleted:
+            logger.info(
+                "%s %s's records were deleted from Redis.", deleted, self.model_name
+            )
+        return deleted
+
+    async def _delete_many_in_cluster(
+        self, keys: list[str], other_keys: list[str], redis_session: Redis
+    ) -> int:
+        """A record and its pointer may be in different slots, so no script spans both."""
+        records = [
+            self._convert_cached_data_to_dict(data)
+            for data in await mget(redis_session, keys)
+            if data is not None
+        ]
+        async with redis_session.pipeline(transaction=False) as pipe:
+            for key in keys + other_keys:
+                pipe.unlink(key)
+            for data in records:
+                if isinstance(data.get("email"), str):
+                    pipe.unlink(self._get_email_key(data["email"]))
+                    pipe.unlink(self._get_miss_key(None, data["email"]))
+            results = await pipe.execute()
+        return sum(results[: len(keys)])
+
+    def _get_generation_key(self) -> str:
+        return f"{{{self.model_name}:list}}:generation"
+
+    def _get_list_key(self, params: dict) -> str:
+        params = dumps(params, sort_keys=True, default=str)
+        return f"{{{self.model_name}:list}}:{params}"
+
+    @_guarded(default=(0, None))
+    async def find_list(
+        self, redis_session: Redis, params: dict
+    ) -> tuple[int, str | None]:
+        """
+        Returns the current list generation and the serialized list
+        if it was cached in that generation.
+        """
+        generation, data = await redis_session.mget(
+            self._get_generation_key(), self._get_list_key(params)
+        )
+        generation = int(generation or 0)
+        if data is not None:
+            cached_generation, _, data = data.decode().partition(":")
+            if int(cached_generation) == generation:
+                logger.info("%s list was taken from Redis.", self.model_name)
+                return generation, data
+        return generation, None
+
+    @_guarded_write()
+    async def add_list(
+        self, redis_session: Redis, params: dict, generation: int, data: str
+    ) -> None:
+        """
+        Caches the serialized list with the generation read before querying the db,
+        so a list racing with a write is never served after it.
+        """
+        await redis_session.set(
+            self._get_list_key(params),
+            f"{generation}:{data}",
+            ex=settings.REDIS_LIST_EXPIRATION_TIME,
+        )
+
+    @_guarded_write(written_records=lambda redis_session: [])
+    async def bump_generation(self, redis_session: Redis) -> None:
+        """Invalidates all cached lists at once."""
+        await redis_session.incr(self._get_generation_key())
+
+    def _get_count_key(self, params: dict) -> str:
+        return f"{self.model_name}:count:{dumps(params, sort_keys=True, default=str)}"
+
+    @_guarded()
+    async def find_count(self, redis_session: Redis, params: dict) -> int | None:
+        count = await redis_session.get(self._get_count_key(params))
+        return int(count) if count is not None else None
+
+    @_guarded_write()
+    async def add_count(self, redis_session: Redis, params: dict, count: int) -> None:
+        await redis_session.set(
+            self._get_count_key(params),
+            count,
+            ex=settings.REDIS_COUNT_EXPIRATION_TIME,
+        )
+
+    def _get_primary_pin_key(self, email: str) -> str:
+        return f"primary_pin:{self.model_name}:{email}"
+
+    @_guarded_write()
+    async def pin_to_primary(self, redis_session: Redis, *emails: str) -> None:
+        """Routes reads of the record's owner to the primary db while replicas catch up."""
+        async with redis_session.pipeline(transaction=False) as pipe:
+            for email in emails:
+                pipe.set(
+                    self._get_primary_pin_key(email),
+                    1,
+                    ex=settings.READ_YOUR_WRITES_WINDOW,
+                )
+            await pipe.execute()
+
+    # Unknown pins route reads to the primary.
+    @_guarded(default=True)
+    async def is_pinned_to_primary(self, redis_session: Redis, email: str) -> bool:
+        return bool(await redis_session.exists(self._get_primary_pin_key(email)))
+
+    def _get_permissions_version_key(self, id: int) -> str:
+        return f"permissions_version:{self.model_name}:{id}"
+
+    @property
+    def permissions_version_expiration_time(self) -> int:
+        return settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60 * 2
+
+    @_guarded()
+    async def get_permissions_version(
+        self, redis_session: Redis, id: int
+    ) -> int | None:
+        """
+        Returns None for an unknown version, e.g. after an eviction:
+        tokens carrying any version then have their claims reloaded from the db.
+        """
+        version = await redis_session.get(self._get_permissions_version_key(id))
+        return int(version) if version is not None else None
+
+    @_guarded()
+    async def issue_permissions_version(self, redis_session: Redis, id: int) -> int:
+        """Returns the version to embed in a new token, kept until the token expires."""
+        version = await ISSUE_PERMISSIONS_VERSION_SCRIPT(
+            keys=[self._get_permissions_version_key(id)],
+            args=[time_ns() // 1000, self.permissions_version_expiration_time],
+            client=redis_session,
+        )
+        return int(version)
+
+    @_guarded_write(written_records=lambda redis_session, id: [(id, None)])
+    async def bump_permissions_version(self, redis_session: Redis, id: int) -> None:
+        """
+        Invalidates authorization claims issued for the record so far.
+
+        The version is a timestamp rather than a counter, so once the key expires
+        (after every token that could carry it has expired), it is never reused.
+        """
+        await redis_session.set(
+            self._get_permissions_version_key(id),
+            time_ns() // 1000,
+            ex=self.permissions_version_expiration_time,
+        )
 
     async def update_one(self):
         """Implementation isn't required."""
@@ -98,3 +559,32 @@ class RedisRepository(AbstractRepository):
     async def find_all(self):
         """Implementation isn't required."""
         pass
+
+
+async def _evict_missed_writes() -> None:
+    """
+    Evicts records written while Redis was unavailable and invalidates lists.
+    Tokens of those records reload their claims once, as a permission change
+    could be among the missed writes.
+    """
+    redis_session = get_shared_redis_client()
+    for repository_class, records in list(_missed_writes.items()):
+        repository, evicted_records = repository_class(), set(records)
+        evicted_ids = list({id for id, _ in evicted_records})
+        await RedisRepository.delete_many.__wrapped__(
+            repository,
+            evicted_ids,
+            redis_session,
+            [email for _, email in evicted_records if email is not None],
+        )
+        await RedisRepository.bump_generation.__wrapped__(repository, redis_session)
+        for id in evicted_ids:
+            await RedisRepository.bump_permissions_version.__wrapped__(
+                repository, redis_session, id
+            )
+        records.difference_update(evicted_records)
+        if not records:
+            del _missed_writes[repository_class]
+
+
+redis_circuit_breaker.add_probe_step(_evict_missed_writes)
@@ -0,0 +1,151 @@
+"""Contains Redis repository for refresh token sessions."""
+
+from json import loads, dumps
+from redis.asyncio import Redis
+
+from ..db.redis_config import create_script, is_cluster_client, mget
+from ..utils.app_loggers import get_logger
+from ..core.settings import get_settings
+from .base import AbstractRepository
+
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+# Swaps the stored refresh token hash only if the presented one matches
+# and extends the session and the user's session set (KEYS[2]) by ARGV[4] seconds.
+# A mismatch means an already rotated token was reused, so the session is dropped.
+ROTATE_SESSION_SCRIPT = create_script(
+    """
+local data = redis.call('GET', KEYS[1])
+if not data then
+    return {0, false}
+end
+local session = cjson.decode(data)
+if session['refresh_token_hash'] ~= ARGV[1] then
+    redis.call('UNLINK', KEYS[1])
+    redis.call('SREM', KEYS[2], session['id'])
+    return {-1, data}
+end
+session['refresh_token_hash'] = ARGV[2]
+session['refreshed_at'] = ARGV[3]
+data = cjson.encode(session)
+redis.call('SET', KEYS[1], data, 'EX', ARGV[4])
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+return {1, data}
+"""
+)
+
+
+class SessionRedisRepository(AbstractRepository):
+    model_name = "Session"
+
+    @property
+    def expiration_time(self) -> int:
+        return settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60
+
+    def _get_session_key(self, session_id: str) -> str:
+        # Session ids start with the user's id, see `create_refresh_token`,
+        # so a session and its user's set share a cluster slot.
+        user_id, _, _ = session_id.partition("-")
+        return f"{self.model_name}:{{{user_id}}}:{session_id}"
+
+    def _get_user_sessions_key(self, user_id: int | str) -> str:
+        return f"{self.model_name}:user:{{{user_id}}}"
+
+    async def add_one(self, data: dict, redis_session: Redis) -> None:
+        async with redis_session.pipeline(
+            transaction=not is_cluster_client(redis_session)
+        ) as pipe:
+            pipe.set(
+                self._get_session_key(data["id"]),
+                dumps(data),
+                ex=self.expiration_time,
+            )
+            pipe.sadd(self._get_user_sessions_key(data["user_id"]), data["id"])
+            pipe.expire(
+                self._get_user_sessions_key(data["user_id"]), self.expiration_time
+            )
+            await pipe.execute()
+        logger.info(
+            "A new %s for user with id=%s was stored in Redis.",
+            self.model_name,
+            data["user_id"],
+        )
+
+    async def find_one(self, redis_session: Redis, session_id: str) -> dict | None:
+        data = await redis_session.get(self._get_session_key(session_id))
+        if data is not None:
+            return loads(data)
+
+    async def find_all(self, redis_session: Redis, user_id: int) -> list[dict]:
+        user_sessions_key = self._get_user_sessions_key(user_id)
+        session_ids = [
+            session_id.decode()
+            for session_id in await redis_session.smembers(user_sessions_key)
+        ]
+        if not session_ids:
+            return []
+        sessions = await mget(
+            redis_session,
+            [self._get_session_key(session_id) for session_id in session_ids],
+        )
+        expired_ids = [
+            session_id
+            for session_id, data in zip(session_ids, sessions)
+            if data is None
+        ]
+        if expired_ids:
+            await redis_session.srem(user_sessions_key, *expired_ids)
+        return [loads(data) for data in sessions if data is not None]
+
+    async def update_one(
+        self,
+        redis_session: Redis,
+        session_id: str,
+        refresh_token_hash: str,
+        new_refresh_token_hash: str,
+        refreshed_at: str,
+    ) -> tuple[int, dict | None]:
+        """
+        Rotates session's refresh token hash and extends the session's lifetime.
+
+        Returns a status (1 - rotated, 0 - unknown session, -1 - token reuse, session revoked)
+        and the session's data.
+        """
+        status, data = await ROTATE_SESSION_SCRIPT(
+            keys=[
+                self._get_session_key(session_id),
+                self._get_user_sessions_key(session_id.partition("-")[0]),
+            ],
+            args=[
+                refresh_token_hash,
+                new_refresh_token_hash,
+                refreshed_at,
+                self.expiration_time,
+            ],
+            client=redis_session,
+        )
+        data = loads(data) if data else None
+        if status == -1:
+            logger.warning(
+                "A reused refresh token revoked %s with id=%s.",
+                self.model_name,
+                session_id,
+            )
+        return status, data
+
+    async def delete_one(
+        self, redis_session: Redis, session_id: str, user_id: int
+    ) -> bool:
+        async with redis_session.pipeline(
+            transaction=not is_cluster_client(redis_session)
+        ) as pipe:
+            pipe.unlink(self._get_session_key(session_id))
+            pipe.srem(self._get_user_sessions_key(user_id), session_id)
+            deleted, _ = await pipe.execute()
+        if deleted:
+            logger.info(
+                "A %s with id=%s was revoked in Redis.", self.model_name, session_id
+            )
+        return bool(deleted)
@@ -2,12 +2,13 @@
 
 from re import compile
 from typing import Any, Dict
-from sqlalchemy import select, insert, update, delete
+from sqlalchemy import select, insert, update, delete, func, or_, over, text
+from sqlalchemy import bindparam, any_, Integer, literal
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
 from sqlalchemy.sql.expression import literal_column
 from sqlalchemy.engine.result import exc
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import Sequence
 
 from .base import AbstractRepository
 from ..utils.app_loggers import get_logger
@@ -16,7 +17,80 @@ from ..utils.app_loggers import get_logger
 class SQLAlchemyRepository(AbstractRepository):
     model = None
     model_name = None
+    search_fields: tuple[str, ...] = ()
+    # Columns returned by list reads, all of them if empty.
+    read_columns: tuple[str, ...] = ()
     logger = get_logger(__name__)
+    _statements: dict[tuple[type, str], Any] = {}
+
+    @staticmethod
+    async def _execute_read(session: AsyncSession, stmt, params: dict | None = None):
+        """
+        Executes a read and ends its transaction, so the pooled connection is returned
+        right away instead of being held until the request ends. Async results are
+        buffered, so rows stay readable after that.
+
+        A transaction the caller began or has pending changes for is left open,
+        so a read never commits someone else's unit of work.
+        """
+        owns_transaction = not session.in_transaction() and not (
+            session.new or session.dirty or session.deleted
+        )
+        result = await session.execute(stmt, params)
+        if owns_transaction:
+            await session.commit()
+        return result
+
+    def _get_stmt(self, name: str):
+        """
+        Returns the `_build_<name>_stmt` statement built once per repository class.
+        Values are passed as bind params on execution, so SQLAlchemy reuses
+        the statement's memoized cache key and compiled form on every call.
+        """
+        key = (type(self), name)
+        if key not in self._statements:
+            self._statements[key] = getattr(self, f"_build_{name}_stmt")()
+        return self._statements[key]
+
+    def _build_find_by_id_stmt(self):
+        table = self.model.__table__
+        return select(table).where(table.c.id == bindparam("id"))
+
+    def _build_find_by_id_for_update_stmt(self):
+        return self._build_find_by_id_stmt().with_for_update()
+
+    def _build_find_by_email_stmt(self):
+        table = self.model.__table__
+        return select(table).where(table.c.email == bindparam("email"))
+
+    def _build_find_by_ids_stmt(self):
+        table = self.model.__table__
+        return select(table).where(
+            table.c.id == any_(bindparam("ids", type_=ARRAY(Integer)))
+        )
+
+    def _build_add_one_stmt(self):
+        return insert(self.model.__table__).returning(literal_column("*"))
+
+    def _build_update_one_stmt(self):
+        table = self.model.__table__
+        return (
+            update(table)
+            .where(table.c.id == bindparam("record_id"))
+            .returning(literal_column("*"))
+        )
+
+    def _build_delete_one_stmt(self):
+        table = self.model.__table__
+        return (
+            delete(table)
+            .where(table.c.id == bindparam("record_id"))
+            .returning(table.c.id)
+        )
+
+    @staticmethod
+    def _escape_like(value: str) -> str:
+        return value.replace("/", "//").replace("%", "/%").replace("_", "/_")
 
     @staticmethod
     def _get_error_message_on_conflict(
@@ -33,54 +107,229 @@ class SQLAlchemyRepository(AbstractRepository):
     async def add_one(
         self, data: dict, session: AsyncSession
     ) -> Dict | tuple[str, str, str] | None:
-        stmt = insert(self.model).values(**data).returning(literal_column("*"))
         try:
-            result = await session.execute(stmt)
+            result = await session.execute(self._get_stmt("add_one"), data)
             await session.commit()
             result = dict(result.mappings().first().items())
             self.logger.info(
-                f"A new {self.model_name} with id={result['id']} was created in the database."
+                "A new %s with id=%s was created in the database.",
+                self.model_name,
+                result["id"],
             )
             return result
         except IntegrityError as exc:
+            await session.rollback()
             error_message = self._get_error_message_on_conflict(exc)
             return error_message
 
+    async def add_or_get_one(
+        self, data: dict, session: AsyncSession, conflict_column: str = "email"
+    ) -> tuple[Dict | tuple[str, str] | None, bool]:
+        """
+        Inserts the record unless one with the same `conflict_column` value exists.
+        Returns the stored record and whether it was created, in one statement.
+
+        The record is None if a concurrent insert committed after the statement began,
+        as it stays invisible to the statement's snapshot; re-read it then.
+        """
+        table = self.model.__table__
+        inserted = (
+            pg_insert(table)
+            .values(data)
+            .on_conflict_do_nothing(index_elements=[conflict_column])
+            .returning(*table.c)
+            .cte("inserted")
+        )
+        stmt = select(inserted, literal(True).label("created")).union_all(
+            select(table, literal(False).label("created")).where(
+                table.c[conflict_column] == data[conflict_column]
+            )
+        )
+        try:
+            result = await session.execute(stmt)
+            await session.commit()
+        except IntegrityError as exc:
+            await session.rollback()
+            return self._get_error_message_on_conflict(exc), False
+        row = result.mappings().first()
+        if row is None:
+            return None, False
+        row = dict(row)
+        created = row.pop("created")
+        if created:
+            self.logger.info(
+                "A new %s with id=%s was created in the database.",
+                self.model_name,
+                row["id"],
+            )
+        return row, created
+
     async def find_one(
         self, session: AsyncSession, id: int | None, email: str | None = None
     ) -> Dict | None:
         if isinstance(id, int):
-            stmt = select(self.model).filter_by(id=id)
+            result = await self._execute_read(
+                session, self._get_stmt("find_by_id"), {"id": id}
+            )
         elif isinstance(email, str):
-            stmt = select(self.model).filter_by(email=email)
+            result = await self._execute_read(
+                session, self._get_stmt("find_by_email"), {"email": email}
+            )
         else:
             return None
-        result = await session.execute(stmt)
-        try:
-            result = dict(result.mappings().first().items())[self.model_name]
-            self.logger.info(
-                f"The {self.model_name} with id={result.id} was SELECTED from the database."
-            )
-            result = result.__dict__
-            del result["_sa_instance_state"]
-            return result
-        except AttributeError as e:
+        result = result.mappings().first()
+        if result is None:
             return None
+        self.logger.info(
+            "The %s with id=%s was SELECTED from the database.",
+            self.model_name,
+            result["id"],
+        )
+        return dict(result)
+
+    async def find_many(self, session: AsyncSession, ids: list[int]) -> list[dict]:
+        """Returns records with the given ids in one query, in no particular order."""
+        if not ids:
+            return []
+        result = await self._execute_read(
+            session, self._get_stmt("find_by_ids"), {"ids": ids}
+        )
+        rows = [dict(row) for row in result.mappings()]
+        self.logger.info(
+            "%s %ss were SELECTED from the database by ids.",
+            len(rows),
+            self.model_name,
+        )
+        return rows
+
+    def _get_read_columns(self, columns: list[str] | None = None) -> list:
+        table = self.model.__table__
+        names = columns or self.read_columns
+        return [table.c[name] for name in names] if names else list(table.c)
+
+    def _get_filter_clauses(self, filters: dict) -> list:
+        """
+        Builds WHERE clauses from `field` (equality), `field__iexact`
+        (compared on lower()), `field__ge` and `field__le` keys. None values are skipped.
+        """
+        clauses = []
+        for key, value in filters.items():
+            if value is None:
+                continue
+            field, _, lookup = key.partition("__")
+            column = getattr(self.model, field)
+            if lookup == "iexact":
+                clauses.append(func.lower(column) == value.lower())
+            elif lookup == "ge":
+                clauses.append(column >= value)
+            elif lookup == "le":
+                clauses.append(column <= value)
+            else:
+                clauses.append(column == value)
+        return clauses
+
+    async def find_all(
+        self,
+        session: AsyncSession,
+        filters: dict | None = None,
+        sort_by: str = "id",
+        descending: bool = False,
+        columns: list[str] | None = None,
+    ) -> list[dict]:
+        """Returns rows as dicts of `columns`, `read_columns` by default."""
+        sort_column = getattr(self.model, sort_by)
+        stmt = (
+            select(*self._get_read_columns(columns))
+            .where(*self._get_filter_clauses(filters or {}))
+            .order_by(
+                sort_column.desc() if descending else sort_column.asc(),
+                self.model.id.desc() if descending else self.model.id.asc(),
+            )
+        )
+        result = await self._execute_read(session, stmt)
+        self.logger.info("All %ss were SELECTED from the db.", self.model_name)
+        return [dict(row) for row in result.mappings()]
+
+    async def count(self, session: AsyncSession, filters: dict | None = None) -> int:
+        stmt = (
+            select(func.count())
+            .select_from(self.model)
+            .where(*self._get_filter_clauses(filters or {}))
+        )
+        return (await self._execute_read(session, stmt)).scalar_one()
+
+    async def estimate_count(self, session: AsyncSession) -> int | None:
+        """
+        Returns the planner's row estimate for the whole table, or None without one:
+        it's -1 for a never analyzed table and 0 for one not vacuumed after a bulk load,
+        so a zero estimate is left to the exact count too.
+        """
+        stmt = text(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)"
+        ).bindparams(table=f'"{self.model.__tablename__}"')
+        result = (await self._execute_read(session, stmt)).scalar_one_or_none()
+        return result if result is not None and result > 0 else None
+
+    def _get_search_filter(self, query: str):
+        columns = [self.model.__table__.c[field] for field in self.search_fields]
+        pattern = f"%{self._escape_like(query)}%"
+        return or_(
+            *(column.ilike(pattern, escape="/") for column in columns),
+            *(column.op("%")(query) for column in columns),
+        )
+
+    def _get_search_stmt(self, query: str, limit: int, offset: int):
+        columns = [self.model.__table__.c[field] for field in self.search_fields]
+        rank = func.greatest(*(func.similarity(column, query) for column in columns))
+        return (
+            select(
+                *self._get_read_columns(),
+                rank.label("rank"),
+                over(func.count()).label("total"),
+            )
+            .where(self._get_search_filter(query))
+            .order_by(rank.desc(), self.model.id)
+            .limit(limit)
+            .offset(offset)
+        )
 
-    async def find_all(self, session: AsyncSession) -> Sequence[Any]:
-        stmt = select(self.model)
-        result = await session.execute(stmt)
-        self.logger.info(f"All {self.model_name}s were SELECTED from the db.")
-        return result.scalars().all()
+    async def search(
+        self, session: AsyncSession, query: str, limit: int, offset: int
+    ) -> tuple[list[dict], int]:
+        """
+        Returns a page of records matching the query in any of `search_fields`
+        as a substring or by trigram similarity, best matches first, and the total count.
+        A page past the end has no rows to carry the total, so it's counted separately.
+        """
+        result = await self._execute_read(
+            session, self._get_search_stmt(query, limit, offset)
+        )
+        rows = result.mappings().all()
+        self.logger.info(
+            "%s %ss matching the search were SELECTED from the db.",
+            len(rows),
+            self.model_name,
+        )
+        if rows:
+            total = rows[0]["total"]
+        elif offset > 0:
+            stmt = (
+                select(func.count())
+                .select_from(self.model)
+                .where(self._get_search_filter(query))
+            )
+            total = (await self._execute_read(session, stmt)).scalar_one()
+        else:
+            total = 0
+        return [dict(row) for row in rows], total
 
     async def delete_one(self, id: int, session: AsyncSession) -> int | None:
-        stmt = delete(self.model).where(self.model.id == id).returning(self.model.id)
-        result = await session.execute(stmt)
+        result = await session.execute(self._get_stmt("delete_one"), {"record_id": id})
         try:
             await session.commit()
             result = result.scalar_one()
             self.logger.info(
-                f"A {self.model_name} with id={id} was DELETED from the database."
+                "A %s with id=%s was DELETED from the database.", self.model_name, id
             )
             return result
         except exc.NoResultFound:
@@ -89,23 +338,58 @@ class SQLAlchemyRepository(AbstractRepository):
     async def update_one(
         self, id: int, data: dict, session: AsyncSession
     ) -> Dict | tuple | None:
-        stmt = (
-            update(self.model)
-            .where(self.model.id == id)
-            .values(**data)
-            .returning(literal_column("*"))
-        )
         try:
             try:
-                result = await session.execute(stmt)
+                result = await session.execute(
+                    self._get_stmt("update_one"), {"record_id": id, **data}
+                )
                 await session.commit()
                 result = dict(result.mappings().first().items())
                 self.logger.info(
-                    f"A {self.model_name} with id={result['id']} was UPDATED in the database."
+                    "A %s with id=%s was UPDATED in the database.",
+                    self.model_name,
+                    result["id"],
                 )
                 return result
             except IntegrityError as exc:
+                await session.rollback()
                 error_message = self._get_error_message_on_conflict(exc)
                 return error_message
         except AttributeError as e:
             return None
+
+    async def patch_one(
+        self, id: int, data: dict, session: AsyncSession
+    ) -> tuple[Dict | tuple | None, set[str]]:
+        """
+        Updates only the fields of `data` that differ from the stored ones.
+        The record is locked while they are compared, so a concurrent write
+        can't make a changed field look unchanged. Returns the record and changed fields.
+        """
+        result = await session.execute(
+            self._get_stmt("find_by_id_for_update"), {"id": id}
+        )
+        record = result.mappings().first()
+        if record is None:
+            await session.rollback()
+            return None, set()
+        changes = {key: value for key, value in data.items() if record[key] != value}
+        if not changes:
+            await session.commit()
+            return dict(record.items()), set()
+        try:
+            result = await session.execute(
+                self._get_stmt("update_one"), {"record_id": id, **changes}
+            )
+            await session.commit()
+        except IntegrityError as exc:
+            await session.rollback()
+            return self._get_error_message_on_conflict(exc), set()
+        result = dict(result.mappings().first().items())
+        self.logger.info(
+            "%s fields of a %s with id=%s were UPDATED in the database.",
+            len(changes),
+            self.model_name,
+            id,
+        )
+        return result, set(changes)
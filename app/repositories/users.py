@@ -1,4 +1,7 @@
 """Contains SQLAlchemy repository for User model."""
+from datetime import datetime, timedelta
+from typing import AsyncIterator
+from sqlalchemy import select, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..models.users import User
@@ -10,6 +13,38 @@ from .redis import RedisRepository
 class UserSQLARepository(SQLAlchemyRepository):
     model = User
     model_name = User.__tablename__
+    search_fields = ("firstname", "lastname", "email", "city")
+    read_columns = tuple(
+        column.name for column in User.__table__.c if column.name != "hashed_password"
+    )
+
+    async def stream_hot_set(
+        self,
+        session: AsyncSession,
+        limit: int,
+        active_days: int,
+        batch_size: int,
+    ) -> AsyncIterator[list[dict]]:
+        """
+        Yields batches of superusers and recently updated users, most relevant first.
+
+        Rows are fetched with a server-side cursor, so only one batch is held at a time.
+        """
+        stmt = (
+            select(*self.model.__table__.c)
+            .where(
+                or_(
+                    self.model.is_superuser.is_(True),
+                    self.model.updated_at
+                    >= datetime.utcnow() - timedelta(days=active_days),
+                )
+            )
+            .order_by(self.model.is_superuser.desc(), self.model.updated_at.desc())
+            .limit(limit)
+        )
+        result = await session.stream(stmt)
+        async for partition in result.mappings().partitions(batch_size):
+            yield [dict(row) for row in partition]
 
 
 class UserRedisRepository(RedisRepository):
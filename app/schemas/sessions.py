@@ -0,0 +1,18 @@
+"""Contains refresh token session schemas."""
+
+from datetime import datetime
+
+from typing import List
+from pydantic import BaseModel
+
+
+class SessionSchema(BaseModel):
+    id: str
+    created_at: datetime
+    refreshed_at: datetime
+    user_agent: str | None
+    is_current: bool = False
+
+
+class SessionsListResponseSchema(BaseModel):
+    sessions: List[SessionSchema]
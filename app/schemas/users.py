@@ -1,9 +1,9 @@
 """Contains user schemas."""
 
-from datetime import datetime
+from datetime import datetime, timezone
 
-from typing import List
-from pydantic import BaseModel, EmailStr, Field
+from typing import List, Literal
+from pydantic import BaseModel, EmailStr, Field, field_validator
 
 
 class UserSchema(BaseModel):
@@ -21,6 +21,26 @@ class UserSchema(BaseModel):
     updated_at: datetime
 
 
+UserField = Literal[tuple(UserSchema.model_fields)]
+
+
+class UserProjectionSchema(BaseModel):
+    """UserSchema with only the requested fields set."""
+
+    id: int
+    email: EmailStr | None = None
+    phone: str | None = None
+    firstname: str | None = None
+    lastname: str | None = None
+    city: str | None = None
+    links: List[str] | None = None
+    avatar: str | None = None
+    is_active: bool | None = None
+    is_superuser: bool | None = None
+    created_at: datetime | None = None
+    updated_at: datetime | None = None
+
+
 class SignInRequestSchema(BaseModel):
     email: EmailStr
     password: str = Field(
@@ -49,10 +69,85 @@ class UserUpdateRequestSchema(BaseModel):
     is_superuser: bool | None
 
 
+class UserPatchRequestSchema(BaseModel):
+    """Only the fields present in the request are changed."""
+
+    password: str | None = Field(None, min_length=6, max_length=128)
+    phone: str | None = None
+    firstname: str | None = None
+    lastname: str | None = None
+    city: str | None = None
+    links: List[str] | None = None
+    avatar: str | None = None
+    is_active: bool | None = None
+    is_superuser: bool | None = None
+
+    @field_validator("password", "firstname", "is_active", "is_superuser")
+    @classmethod
+    def not_null(cls, value):
+        if value is None:
+            raise ValueError("The field can't be null.")
+        return value
+
+
 class UsersListResponseSchema(BaseModel):
     users: List[UserSchema]
 
 
+class UsersFilterSchema(BaseModel):
+    """User list filters. Email is matched case-insensitively."""
+
+    is_active: bool | None = None
+    is_superuser: bool | None = None
+    city: str | None = None
+    email: str | None = None
+    created_after: datetime | None = None
+    created_before: datetime | None = None
+
+    @field_validator("created_after", "created_before")
+    @classmethod
+    def to_naive_utc(cls, value: datetime | None) -> datetime | None:
+        """`created_at` is stored as naive UTC time."""
+        if value is not None and value.tzinfo is not None:
+            return value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+
+class UsersListQuerySchema(UsersFilterSchema):
+    sort_by: Literal["id", "email", "lastname", "city", "created_at"] = "id"
+    order: Literal["asc", "desc"] = "asc"
+
+
+class UsersCountResponseSchema(BaseModel):
+    count: int
+    estimated: bool
+
+
+class UsersBatchRequestSchema(BaseModel):
+    ids: List[int] = Field(min_length=1, max_length=100)
+
+
+class UsersBatchResponseSchema(UsersListResponseSchema):
+    not_found: List[int]
+    forbidden: List[int]
+
+
+class UsersProjectionListResponseSchema(BaseModel):
+    users: List[UserProjectionSchema]
+
+
+class UsersSearchResponseSchema(UsersListResponseSchema):
+    total: int
+    page: int
+    size: int
+
+
 class TokenSchema(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: str | None = None
+    expires_in: int | None = None
+
+
+class RefreshTokenRequestSchema(BaseModel):
+    refresh_token: str
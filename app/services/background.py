@@ -0,0 +1,69 @@
+"""Contains a runner of cache writes taken off the response path."""
+
+import asyncio
+from typing import Awaitable, Callable
+from redis.asyncio import Redis
+
+from ..core.settings import get_settings
+from ..db.redis_config import get_shared_redis_client
+from ..utils.app_loggers import get_logger
+from ..utils.metrics import metrics_registry
+
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+background_writes = metrics_registry.counter(
+    "cache_background_writes_total", "Background cache writes by operation and result."
+)
+background_writes_pending = metrics_registry.gauge(
+    "cache_background_writes_pending", "Background cache writes scheduled or running."
+)
+
+
+class BackgroundCacheWriter:
+    """
+    Runs cache writes as tasks with at most `max_concurrency` of them talking to Redis.
+
+    Writes get the worker's shared Redis client, as the request's one is closed
+    with the response. Beyond `max_pending` writes new ones are dropped:
+    a lost fill only costs a later cache miss.
+    """
+
+    def __init__(self, max_concurrency: int, max_pending: int):
+        self.max_pending = max_pending
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._tasks: set[asyncio.Task] = set()
+
+    def schedule(self, operation: str, write: Callable[[Redis], Awaitable]) -> None:
+        if len(self._tasks) >= self.max_pending:
+            background_writes.inc(operation=operation, result="dropped")
+            return
+        task = asyncio.create_task(self._run(operation, write))
+        self._tasks.add(task)
+        task.add_done_callback(self._on_done)
+        background_writes_pending.set(len(self._tasks))
+
+    def _on_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        background_writes_pending.set(len(self._tasks))
+
+    async def _run(self, operation: str, write: Callable[[Redis], Awaitable]) -> None:
+        async with self._semaphore:
+            try:
+                await write(get_shared_redis_client())
+            except Exception as e:
+                background_writes.inc(operation=operation, result="error")
+                logger.warning("Background cache write %s failed: %s", operation, e)
+            else:
+                background_writes.inc(operation=operation, result="ok")
+
+    async def drain(self, timeout: float) -> None:
+        """Waits for scheduled writes, e.g. before the worker shuts down."""
+        if self._tasks:
+            await asyncio.wait(list(self._tasks), timeout=timeout)
+
+
+background_cache_writer = BackgroundCacheWriter(
+    settings.CACHE_BACKGROUND_CONCURRENCY, settings.CACHE_BACKGROUND_MAX_PENDING
+)
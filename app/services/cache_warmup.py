@@ -0,0 +1,39 @@
+"""Contains cache warm-up job run on app startup."""
+
+from time import perf_counter
+
+from ..core.settings import get_settings
+from ..db.psql_config import get_async_session_maker
+from ..db.redis_config import open_redis_session
+from ..utils.app_loggers import get_logger
+from .users import UserService
+
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+# Held until expiration, so workers booting within a deploy warm the cache only once.
+WARMUP_LOCK_KEY = "cache_warmup:lock"
+WARMUP_LOCK_EXPIRATION_TIME = 5 * 60
+
+
+async def run_cache_warmup(users_service: UserService) -> None:
+    async with open_redis_session() as redis_session:
+        is_locked = await redis_session.set(
+            WARMUP_LOCK_KEY, 1, nx=True, ex=WARMUP_LOCK_EXPIRATION_TIME
+        )
+        if not is_locked:
+            logger.info("Cache warm-up is skipped: another worker runs it.")
+            return
+        started_at = perf_counter()
+        try:
+            async with get_async_session_maker()() as psql_session:
+                cached = await users_service.warm_up_cache(redis_session, psql_session)
+        except Exception:
+            logger.exception("Cache warm-up failed.")
+            return
+    logger.info(
+        "Cache warm-up finished: %s users were cached in %.2fs.",
+        cached,
+        perf_counter() - started_at,
+    )
@@ -0,0 +1,101 @@
+"""Contains readiness checks of the app's dependencies."""
+
+import asyncio
+from time import monotonic, perf_counter
+from typing import Awaitable, Callable
+from sqlalchemy import text
+
+from ..core.settings import get_settings
+from ..db.psql_config import get_async_engine, get_replica_engines
+from ..db.redis_config import get_shared_redis_client
+from ..utils.app_loggers import get_logger
+
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+# Dependencies the app can't serve requests without. Other checks are only reported:
+# without Redis the circuit breaker serves users from PostgreSQL.
+CRITICAL_CHECKS = ("psql",)
+
+_ready_lock = asyncio.Lock()
+_ready_cache: tuple[float, dict] | None = None
+
+
+async def check_psql() -> None:
+    async with get_async_engine().connect() as connection:
+        await connection.execute(text("SELECT 1"))
+
+
+async def check_redis() -> None:
+    await get_shared_redis_client().ping()
+
+
+async def check_jwks() -> None:
+    from httpx import AsyncClient
+
+    async with AsyncClient() as client:
+        response = await client.get(settings.AUTH0_JWKS_LINK)
+        response.raise_for_status()
+
+
+async def run_check(name: str, check: Callable[[], Awaitable]) -> dict:
+    """Returns the check's result with its latency in milliseconds."""
+    start = perf_counter()
+    try:
+        await asyncio.wait_for(check(), settings.HEALTH_CHECK_TIMEOUT)
+        error = None
+    except asyncio.TimeoutError:
+        error = f"Timed out after {settings.HEALTH_CHECK_TIMEOUT}s"
+    except Exception as e:
+        error = str(e) or type(e).__name__
+    if error is not None:
+        logger.error("%s's readiness check: FAILURE! %s", name, error)
+    return {
+        "ok": error is None,
+        "latency_ms": round((perf_counter() - start) * 1000, 3),
+        "error": error,
+    }
+
+
+def get_pool_stats() -> dict:
+    return {
+        name: {
+            "size": engine.pool.size(),
+            "checked_in": engine.pool.checkedin(),
+            "checked_out": engine.pool.checkedout(),
+            "overflow": engine.pool.overflow(),
+        }
+        for name, engine in (
+            ("psql", get_async_engine()),
+            *(
+                (f"psql_replica_{i}", engine)
+                for i, engine in enumerate(get_replica_engines())
+            ),
+        )
+    }
+
+
+async def check_readiness() -> dict:
+    """
+    Runs all checks concurrently. The result is reused for `HEALTH_READY_CACHE_TTL`
+    seconds and concurrent callers wait for the same run, so probes don't pile up.
+    """
+    global _ready_cache
+    async with _ready_lock:
+        if _ready_cache is not None and monotonic() - _ready_cache[0] < (
+            settings.HEALTH_READY_CACHE_TTL
+        ):
+            return {**_ready_cache[1], "cached": True}
+        checks = {"psql": check_psql, "redis": check_redis, "jwks": check_jwks}
+        results = await asyncio.gather(
+            *(run_check(name, check) for name, check in checks.items())
+        )
+        checks = dict(zip(checks, results))
+        result = {
+            "ready": all(checks[name]["ok"] for name in CRITICAL_CHECKS),
+            "checks": checks,
+            "pools": get_pool_stats(),
+        }
+        _ready_cache = (monotonic(), result)
+        return {**result, "cached": False}
@@ -1,8 +1,9 @@
 from typing import Tuple
 from functools import cache
+from hashlib import sha256
+from secrets import token_hex, token_urlsafe
 from datetime import timedelta
 from datetime import datetime
-from httpx import Client
 from fastapi import Request
 from fastapi.exceptions import HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
@@ -23,6 +24,8 @@ settings = get_settings()
 
 @cache
 def get_auth0_key():
+    from httpx import Client
+
     with Client() as client:
         return client.get(url=settings.AUTH0_JWKS_LINK).json()
 
@@ -55,9 +58,11 @@ class JWTBearer(HTTPBearer):
 def create_access_token(
     email: str,
     epires_delta: timedelta = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES),
+    extra_claims: dict | None = None,
 ) -> str:
     return jwt.encode(
         {
+            **(extra_claims or {}),
             "sub": email,
             "exp": datetime.utcnow() + epires_delta,
             "aud": settings.API_AUDIENCE,
@@ -68,6 +73,38 @@ def create_access_token(
     )
 
 
+def get_authorization_claims(user: dict, permissions_version: int) -> dict:
+    """Returns claims enough for permission checks without a user lookup."""
+    return {
+        "uid": user["id"],
+        "is_superuser": user["is_superuser"],
+        "pv": permissions_version,
+    }
+
+
+def hash_refresh_token_secret(secret: str) -> str:
+    return sha256(secret.encode()).hexdigest()
+
+
+def create_refresh_token(
+    user_id: int, session_id: str | None = None
+) -> Tuple[str, str, str]:
+    """
+    Returns session id, an opaque refresh token and the token's hash to store.
+    Session ids are prefixed with the user's id to find the user's sessions by it.
+    """
+    session_id = session_id or f"{user_id}-{token_hex(16)}"
+    secret = token_urlsafe(32)
+    return session_id, f"{session_id}.{secret}", hash_refresh_token_secret(secret)
+
+
+def parse_refresh_token(refresh_token: str) -> Tuple[str, str] | None:
+    """Returns session id and the token's hash."""
+    session_id, _, secret = refresh_token.partition(".")
+    if session_id and secret:
+        return session_id, hash_refresh_token_secret(secret)
+
+
 def decode_jwt(token: str, secret_key: str | dict) -> dict:
     claims = jwt.decode(
         token=token,
@@ -99,6 +136,18 @@ def verify(token: str) -> dict | None:
             )
 
 
+def get_unverified_email(token: str) -> str | None:
+    """
+    Reads the email from a token without verifying it.
+    Only for choices that are safe whatever the token says, e.g. db routing.
+    """
+    try:
+        claims = jwt.get_unverified_claims(token)
+    except JWTError:
+        return None
+    return claims.get("email") or claims.get("sub")
+
+
 def get_current_user_email(token: str) -> Tuple[str, str]:
     token = verify(token)
     if token is not None:
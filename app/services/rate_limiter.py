@@ -0,0 +1,143 @@
+"""Contains Redis-backed rate limiting tools."""
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from ..core.settings import get_settings
+from ..db.redis_config import create_script, is_cluster_client, redis_circuit_breaker
+from ..utils.app_loggers import get_logger
+from ..utils.error_handlers import too_many_requests_error
+from ..utils.metrics import metrics_registry
+
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+rate_limit_rejections = metrics_registry.counter(
+    "rate_limit_rejections_total", "Requests rejected by a rate limiter."
+)
+rate_limit_errors = metrics_registry.counter(
+    "rate_limit_errors_total", "Rate limiter checks skipped because of Redis errors."
+)
+
+# Takes a token from every bucket in KEYS or from none of them.
+# ARGV holds (capacity, refill rate per second) pairs in the order of KEYS.
+# Returns {0, 0} on success, otherwise {retry after in ms, 1-based index of the empty bucket}.
+TOKEN_BUCKET_SCRIPT = create_script(
+    """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local tokens = {}
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2 - 1])
+    local refill_per_ms = tonumber(ARGV[i * 2]) / 1000
+    local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+    local available = tonumber(bucket[1]) or capacity
+    local ts = tonumber(bucket[2]) or now
+    available = math.min(capacity, available + (now - ts) * refill_per_ms)
+    if available < 1 then
+        return {math.ceil((1 - available) / refill_per_ms), i}
+    end
+    tokens[i] = available
+end
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2 - 1])
+    local refill_per_ms = tonumber(ARGV[i * 2]) / 1000
+    redis.call('HSET', key, 'tokens', tostring(tokens[i] - 1), 'ts', tostring(now))
+    redis.call('PEXPIRE', key, math.ceil(capacity / refill_per_ms))
+end
+return {0, 0}
+"""
+)
+
+
+class TokenBucketRateLimiter:
+    """
+    Atomic token bucket limiter evaluated by a Lua script in Redis.
+
+    `buckets` maps an identifier name (e.g. "ip") to its capacity and refill rate
+    in tokens per second. One attempt takes a token from every bucket or from none.
+    Buckets are spread over cluster slots by their identifiers, so in cluster mode
+    each one is checked by its own call, and a token taken from an earlier bucket
+    isn't returned when a later one is empty.
+    """
+
+    def __init__(self, scope: str, buckets: dict[str, tuple[int, float]]):
+        self.scope = scope
+        self.buckets = buckets
+
+    def _get_key(self, name: str, identifier: str) -> str:
+        return f"rate_limit:{self.scope}:{name}:{{{identifier}}}"
+
+    async def acquire(self, redis_session: Redis, **identifiers: str) -> int:
+        """
+        Returns 0 when the attempt is allowed, otherwise seconds to wait before retry.
+        Fails open, without waiting on Redis while the cache circuit breaker is open.
+        """
+        if redis_circuit_breaker.is_open:
+            rate_limit_errors.inc(scope=self.scope)
+            return 0
+        names = list(identifiers)
+        keys = [self._get_key(name, identifiers[name]) for name in names]
+        args = []
+        for name in names:
+            args.extend(self.buckets[name])
+        try:
+            if is_cluster_client(redis_session):
+                retry_after_ms, index = await self._acquire_in_cluster(
+                    redis_session, keys, args
+                )
+            else:
+                retry_after_ms, index = await TOKEN_BUCKET_SCRIPT(
+                    keys=keys, args=args, client=redis_session
+                )
+        except RedisError as e:
+            rate_limit_errors.inc(scope=self.scope)
+            logger.warning("Rate limiter for %s is skipped: %s", self.scope, e)
+            return 0
+        if retry_after_ms > 0:
+            rate_limit_rejections.inc(scope=self.scope, key=names[index - 1])
+            return -(-retry_after_ms // 1000)
+        return 0
+
+    @staticmethod
+    async def _acquire_in_cluster(
+        redis_session: Redis, keys: list[str], args: list
+    ) -> tuple[int, int]:
+        for i, key in enumerate(keys):
+            retry_after_ms, _ = await TOKEN_BUCKET_SCRIPT(
+                keys=[key], args=args[i * 2 : i * 2 + 2], client=redis_session
+            )
+            if retry_after_ms > 0:
+                return retry_after_ms, i + 1
+        return 0, 0
+
+
+login_rate_limiter = TokenBucketRateLimiter(
+    "login",
+    {
+        "ip": (
+            settings.LOGIN_RATE_LIMIT_IP_CAPACITY,
+            settings.LOGIN_RATE_LIMIT_IP_PER_MINUTE / 60,
+        ),
+        "email": (
+            settings.LOGIN_RATE_LIMIT_EMAIL_CAPACITY,
+            settings.LOGIN_RATE_LIMIT_EMAIL_PER_MINUTE / 60,
+        ),
+    },
+)
+
+
+async def check_login_rate_limit(
+    redis_session: Redis, client_ip: str, email: str
+) -> None:
+    """Raises 429 error if login attempts from the IP or for the email are exhausted."""
+    if not settings.LOGIN_RATE_LIMIT_ENABLED:
+        return
+    retry_after = await login_rate_limiter.acquire(
+        redis_session, ip=client_ip, email=email.lower()
+    )
+    if retry_after > 0:
+        raise too_many_requests_error(
+            "Too many login attempts, try again later!", retry_after
+        )
@@ -1,4 +1,4 @@
-from app.schemas.users import UserUpdateRequestSchema
+from app.schemas.users import UserUpdateRequestSchema, UserPatchRequestSchema
 from app.utils.error_handlers import permition_restriction_error
 
 
@@ -14,8 +14,10 @@ def check_user_fields_permithon_on_update(
 ):
     is_superuser = current_user["is_superuser"]
     update_form = update_form.model_dump()
-    current_user["password"] = current_user["hashed_password"]
-    current_user = UserUpdateRequestSchema.model_validate(current_user).model_dump()
+    # The stored hash isn't a valid password, e.g. the placeholder of Auth0 users.
+    current_user = UserUpdateRequestSchema.model_validate(
+        {**current_user, "password": None}
+    ).model_dump()
     for key in ("password", "firstname", "lastname"):
         del current_user[key]
         del update_form[key]
@@ -32,3 +34,20 @@ def check_user_update_permitions(
 ):
     check_ownership(current_user, requested_id)
     check_user_fields_permithon_on_update(current_user, update_form)
+
+
+def check_user_patch_permitions(
+    current_user: dict,
+    patch_form: UserPatchRequestSchema,
+    requested_id: int | None = None,
+):
+    check_ownership(current_user, requested_id)
+    if current_user["is_superuser"]:
+        return
+    for key, value in patch_form.model_dump(exclude_unset=True).items():
+        if key not in ("password", "firstname", "lastname") and (
+            current_user.get(key) != value
+        ):
+            raise permition_restriction_error(
+                "You are not allowed to change any User field except for your password, firstname and lastname!"
+            )
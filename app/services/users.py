@@ -1,45 +1,129 @@
 """Contains user related services."""
 
-from typing import Dict, List
+import asyncio
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List
+from fastapi import HTTPException
 from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
-from faker import Faker
 
 from ..schemas.users import (
     SignUpRequestSchema,
+    UserPatchRequestSchema,
     UserUpdateRequestSchema,
+    UsersFilterSchema,
+    UsersListQuerySchema,
+    UsersProjectionListResponseSchema,
 )
 from ..models.users import User
+from ..db.psql_config import is_read_replica
 from ..repositories.sqlalchemy import AbstractRepository
-from ..utils.password_hashing import hash_password
+from ..repositories.redis import CACHE_ERRORS, CACHED_MISS
+from ..utils.password_hashing import hash_password, UNUSABLE_PASSWORD_HASH
 from ..utils.error_handlers import (
     authentication_check,
+    invalid_refresh_token_error,
 )
+from ..core.settings import get_settings
 from .jwt_handler import (
     create_access_token,
+    create_refresh_token,
+    get_authorization_claims,
     get_current_user_email,
+    parse_refresh_token,
+    verify,
 )
-from ..utils.error_handlers import filter_response_for_401_error
+from ..utils.error_handlers import (
+    filter_response_for_401_error,
+    filter_response_for_409_error,
+)
+from ..utils.app_loggers import get_logger
+from ..utils.metrics import metrics_registry
+from .background import background_cache_writer
+from .user_permitions import check_ownership
+
+
+settings = get_settings()
+logger = get_logger(__name__)
 
+cache_warmup_progress = metrics_registry.gauge(
+    "cache_warmup_cached_users", "Users cached by the last cache warm-up."
+)
+
+# Auth0 provisionings running in this worker by email.
+_auth0_provisioning: dict[str, asyncio.Future] = {}
 
-fake = Faker()
+
+@contextmanager
+def _tolerating_cache_errors(operation: str):
+    """
+    Keeps a failed cache write from failing the request. Records the write
+    replaces or invalidates are remembered by the repository and evicted later.
+    """
+    try:
+        yield
+    except CACHE_ERRORS as e:
+        logger.warning("Cache %s failed, the db is served instead: %s", operation, e)
 
 
 class UserService:
     def __init__(
-        self, user_sqla_repo: AbstractRepository, user_redis_repo: AbstractRepository
+        self,
+        user_sqla_repo: AbstractRepository,
+        user_redis_repo: AbstractRepository,
+        session_redis_repo: AbstractRepository,
     ):
         self.users_sqla_repo: AbstractRepository = user_sqla_repo()
         self.users_redis_repo: AbstractRepository = user_redis_repo()
+        self.sessions_redis_repo: AbstractRepository = session_redis_repo()
 
     async def _login_and_authenticaticate(
         self, redis_session: Redis, psql_session: AsyncSession, login_data: dict
     ):
-        return authentication_check(
+        user, new_hashed_password = authentication_check(
             await self.get_user(redis_session, psql_session, None, login_data["email"]),
             login_data,
             User.__tablename__,
         )
+        if new_hashed_password is not None:
+            user = await self._update_password_hash(
+                user, new_hashed_password, redis_session, psql_session
+            )
+        return user
+
+    @staticmethod
+    async def _fill_cache(
+        redis_session: Redis, operation: str, write: Callable[[Redis], Awaitable]
+    ) -> None:
+        """
+        Writes data just read from the db to the cache, in background if enabled.
+        Fills must only add absent keys, as a delayed one could otherwise replace
+        a fresher record. Writes replacing or invalidating cached data stay awaited.
+        """
+        if settings.CACHE_BACKGROUND_WRITES:
+            background_cache_writer.schedule(operation, write)
+        else:
+            with _tolerating_cache_errors(operation):
+                await write(redis_session)
+
+    async def _update_password_hash(
+        self,
+        user: dict,
+        new_hashed_password: str,
+        redis_session: Redis,
+        psql_session: AsyncSession,
+    ) -> Dict:
+        """Stores a password hash made with the current scheme and rounds."""
+        updated_user = await self.users_sqla_repo.update_one(
+            user["id"], {"hashed_password": new_hashed_password}, psql_session
+        )
+        if not isinstance(updated_user, dict):
+            return user
+        # Replaces the cached outdated hash, which would be rehashed on every login.
+        with _tolerating_cache_errors("add_one"):
+            await self.users_redis_repo.add_one(updated_user, redis_session)
+        return updated_user
 
     async def add_user(
         self,
@@ -50,7 +134,11 @@ class UserService:
         user_dict = create_form.model_dump(by_alias=True)
         user_dict["hashed_password"] = hash_password(user_dict["hashed_password"])
         user = await self.users_sqla_repo.add_one(user_dict, psql_session)
-        await self.users_redis_repo.add_one(user, redis_session)
+        if isinstance(user, dict):
+            with _tolerating_cache_errors("add_user"):
+                await self.users_redis_repo.add_one(user, redis_session)
+                await self.users_redis_repo.bump_generation(redis_session)
+                await self.users_redis_repo.pin_to_primary(redis_session, user["email"])
         return user
 
     async def get_user(
@@ -60,30 +148,224 @@ class UserService:
         user_id: int | None,
         email: str | None = None,
     ) -> Dict | None:
-        """Attems Redis hit: on a miss, returns query from the db; on Redis hit returns the user from it."""
+        """
+        Attems Redis hit: on a miss, returns query from the db; on Redis hit returns the user from it.
+        Users absent from the db are cached as misses for a short time.
+        Only primary reads fill the cache, as a lagging replica may miss a user just
+        created or still return one just deleted or demoted.
+        """
         user_from_redis = await self.users_redis_repo.find_one(
             redis_session, user_id, email
         )
+        if user_from_redis is CACHED_MISS:
+            return None
         user = user_from_redis or await self.users_sqla_repo.find_one(
             psql_session, user_id, email
         )
-        if user_from_redis is None:
-            await self.users_redis_repo.add_one(user, redis_session)
+        if user_from_redis is None and not is_read_replica(psql_session):
+            if user is None:
+                with _tolerating_cache_errors("add_miss"):
+                    await self.users_redis_repo.add_miss(redis_session, user_id, email)
+            else:
+                await self._fill_cache(
+                    redis_session,
+                    "add_one",
+                    lambda redis: self.users_redis_repo.add_one(
+                        user, redis, only_if_absent=True
+                    ),
+                )
         return user
 
+    async def get_users_batch(
+        self,
+        redis_session: Redis,
+        psql_session: AsyncSession,
+        current_user: Dict,
+        ids: List[int],
+    ) -> Dict:
+        """
+        Returns users the current user may access in the order of `ids`.
+        Cached ones are taken with one MGET, the rest with one query, then cached
+        unless read from a replica.
+        """
+        ids = list(dict.fromkeys(ids))
+        allowed_ids, forbidden = [], []
+        for user_id in ids:
+            try:
+                check_ownership(current_user, user_id)
+                allowed_ids.append(user_id)
+            except HTTPException:
+                forbidden.append(user_id)
+        users = dict(
+            zip(
+                allowed_ids,
+                await self.users_redis_repo.find_many(redis_session, allowed_ids),
+            )
+        )
+        missed_ids = [user_id for user_id, user in users.items() if user is None]
+        if missed_ids:
+            found = await self.users_sqla_repo.find_many(psql_session, missed_ids)
+            for user in found:
+                users[user["id"]] = user
+        if missed_ids and not is_read_replica(psql_session):
+            await self._fill_cache(
+                redis_session,
+                "add_many",
+                lambda redis: self.users_redis_repo.add_many(
+                    found, redis, only_if_absent=True
+                ),
+            )
+        return {
+            "users": [user for user in users.values() if user is not None],
+            "not_found": [user_id for user_id, user in users.items() if user is None],
+            "forbidden": forbidden,
+        }
+
+    async def warm_up_cache(
+        self, redis_session: Redis, psql_session: AsyncSession
+    ) -> int:
+        """Loads the hot set of users into Redis in batches, pausing between them."""
+        cached = 0
+        cache_warmup_progress.set(cached)
+        async for users in self.users_sqla_repo.stream_hot_set(
+            psql_session,
+            settings.CACHE_WARMUP_LIMIT,
+            settings.CACHE_WARMUP_ACTIVE_DAYS,
+            settings.CACHE_WARMUP_BATCH_SIZE,
+        ):
+            # Users updated while the batch was read are already cached fresher.
+            await self.users_redis_repo.add_many(
+                users, redis_session, only_if_absent=True
+            )
+            cached += len(users)
+            cache_warmup_progress.set(cached)
+            logger.info(
+                "Cache warm-up: %s of up to %s users are cached.",
+                cached,
+                settings.CACHE_WARMUP_LIMIT,
+            )
+            await asyncio.sleep(settings.CACHE_WARMUP_BATCH_DELAY)
+        return cached
+
+    @staticmethod
+    def _get_list_filters(filters: UsersFilterSchema) -> dict:
+        return {
+            "is_active": filters.is_active,
+            "is_superuser": filters.is_superuser,
+            "city": filters.city,
+            "email__iexact": filters.email,
+            "created_at__ge": filters.created_after,
+            "created_at__le": filters.created_before,
+        }
+
     async def get_users(
-        self, psql_session: AsyncSession
-    ) -> Dict[str, List[User]] | Dict[str, List]:
-        return {"users": await self.users_sqla_repo.find_all(psql_session)}
+        self,
+        psql_session: AsyncSession,
+        query: UsersListQuerySchema | None = None,
+        fields: List[str] | None = None,
+    ) -> Dict[str, List[Dict]]:
+        """Selects only `fields` (and `id`) of each user if they are given."""
+        query = query or UsersListQuerySchema()
+        return {
+            "users": await self.users_sqla_repo.find_all(
+                psql_session,
+                filters=self._get_list_filters(query),
+                sort_by=query.sort_by,
+                descending=query.order == "desc",
+                columns=list(dict.fromkeys(["id", *fields])) if fields else None,
+            )
+        }
+
+    async def get_serialized_users(
+        self,
+        redis_session: Redis,
+        psql_session: AsyncSession,
+        query: UsersListQuerySchema,
+        fields: List[str] | None = None,
+    ) -> str:
+        """
+        Returns the user list as JSON, cached until any user is added, changed or deleted.
+        Lists read from a replica aren't cached, as they may predate the last change.
+        """
+        params = {**query.model_dump(exclude_none=True), "fields": fields}
+        generation, data = await self.users_redis_repo.find_list(redis_session, params)
+        if data is None:
+            data = UsersProjectionListResponseSchema(
+                **await self.get_users(psql_session, query, fields)
+            ).model_dump_json(exclude_unset=True)
+            if is_read_replica(psql_session):
+                return data
+            await self._fill_cache(
+                redis_session,
+                "add_list",
+                lambda redis: self.users_redis_repo.add_list(
+                    redis, params, generation, data
+                ),
+            )
+        return data
+
+    async def count_users(
+        self,
+        redis_session: Redis,
+        psql_session: AsyncSession,
+        filters: UsersFilterSchema,
+        estimate: bool = False,
+    ) -> Dict:
+        """
+        Counts Users matching the filters. The estimate is only used for the whole
+        table (exact count is taken and reported until the table is analyzed),
+        filtered counts are exact.
+        """
+        filters = {
+            key: value
+            for key, value in self._get_list_filters(filters).items()
+            if value is not None
+        }
+        estimate = estimate and not filters
+        params = {**filters, "estimate": estimate}
+        count = await self.users_redis_repo.find_count(redis_session, params)
+        if count is None:
+            if estimate:
+                count = await self.users_sqla_repo.estimate_count(psql_session)
+            if count is None:
+                estimate = False
+                params = {**filters, "estimate": estimate}
+                count = await self.users_sqla_repo.count(psql_session, filters)
+            await self._fill_cache(
+                redis_session,
+                "add_count",
+                lambda redis: self.users_redis_repo.add_count(redis, params, count),
+            )
+        return {"count": count, "estimated": estimate}
+
+    async def search_users(
+        self, psql_session: AsyncSession, query: str, page: int, size: int
+    ) -> Dict:
+        users, total = await self.users_sqla_repo.search(
+            psql_session, query, size, (page - 1) * size
+        )
+        return {"users": users, "total": total, "page": page, "size": size}
 
     async def delete_user(
         self,
         user_id: int,
         redis_session: Redis,
         psql_session: AsyncSession,
+        actor_email: str | None = None,
     ) -> int | None:
+        """`actor_email` is pinned to the primary to read the change back."""
         result = await self.users_sqla_repo.delete_one(user_id, psql_session)
-        await self.users_redis_repo.delete_one(result, user_id, redis_session)
+        if result is not None:
+            with _tolerating_cache_errors("delete_user"):
+                await self.users_redis_repo.delete_one(result, user_id, redis_session)
+                await self.users_redis_repo.bump_permissions_version(
+                    redis_session, user_id
+                )
+                await self.users_redis_repo.bump_generation(redis_session)
+                if actor_email is not None:
+                    await self.users_redis_repo.pin_to_primary(
+                        redis_session, actor_email
+                    )
         return result
 
     async def update_user(
@@ -92,12 +374,96 @@ class UserService:
         update_form: UserUpdateRequestSchema,
         redis_session: Redis,
         psql_session: AsyncSession,
+        actor_email: str | None = None,
     ) -> User | tuple | None:
+        """Pins the user and `actor_email`, if given, to the primary."""
         user_dict = update_form.model_dump(exclude_unset=True)
         user_dict["hashed_password"] = hash_password(user_dict["password"])
         del user_dict["password"]
         user = await self.users_sqla_repo.update_one(user_id, user_dict, psql_session)
-        await self.users_redis_repo.add_one(user, redis_session)
+        if isinstance(user, dict):
+            with _tolerating_cache_errors("update_user"):
+                await self.users_redis_repo.add_one(user, redis_session)
+                await self.users_redis_repo.bump_permissions_version(
+                    redis_session, user_id
+                )
+                await self.users_redis_repo.bump_generation(redis_session)
+                await self.users_redis_repo.pin_to_primary(
+                    redis_session, *self._get_pinned_emails(user, actor_email)
+                )
+        return user
+
+    @staticmethod
+    def _get_pinned_emails(user: dict, actor_email: str | None) -> set[str]:
+        """The edited user and the one editing read the change back from the primary."""
+        return {email for email in (user["email"], actor_email) if email is not None}
+
+    async def patch_user(
+        self,
+        user_id: int,
+        patch_form: UserPatchRequestSchema,
+        redis_session: Redis,
+        psql_session: AsyncSession,
+        actor_email: str | None = None,
+    ) -> Dict | tuple | None:
+        """
+        Writes only the fields that differ from the stored ones, compared against
+        the locked db row rather than the cached copy, and hashes the password only
+        if one is supplied. Nothing is written if nothing changed.
+        Pins the user and `actor_email`, if given, to the primary.
+        """
+        user_dict = patch_form.model_dump(exclude_unset=True)
+        password = user_dict.pop("password", None)
+        if password is not None:
+            user_dict["hashed_password"] = hash_password(password)
+        user, changes = await self.users_sqla_repo.patch_one(
+            user_id, user_dict, psql_session
+        )
+        if not changes:
+            return user
+        with _tolerating_cache_errors("patch_user"):
+            await self.users_redis_repo.add_one(user, redis_session)
+            if changes & {"is_active", "is_superuser"}:
+                await self.users_redis_repo.bump_permissions_version(
+                    redis_session, user_id
+                )
+            if changes - {"hashed_password"}:
+                await self.users_redis_repo.bump_generation(redis_session)
+            await self.users_redis_repo.pin_to_primary(
+                redis_session, *self._get_pinned_emails(user, actor_email)
+            )
+        return user
+
+    async def _provision_auth0_user(
+        self, redis_session: Redis, psql_session: AsyncSession, email: str
+    ) -> Dict | None:
+        """
+        Creates the user without a usable password or returns the one created
+        concurrently, racing requests don't fail on the unique email.
+        Returns None if the user was deleted right after a concurrent creation,
+        raises 409 error on a conflict of another unique field.
+        """
+        user, created = await self.users_sqla_repo.add_or_get_one(
+            {
+                "email": email,
+                "hashed_password": UNUSABLE_PASSWORD_HASH,
+                "firstname": "",
+                "lastname": "",
+            },
+            psql_session,
+        )
+        if user is None:
+            user = await self.users_sqla_repo.find_one(psql_session, None, email)
+            if user is None:
+                return None
+        user = filter_response_for_409_error(user, User.__tablename__)
+        with _tolerating_cache_errors("add_user"):
+            await self.users_redis_repo.add_one(
+                user, redis_session, only_if_absent=True
+            )
+            if created:
+                await self.users_redis_repo.bump_generation(redis_session)
+                await self.users_redis_repo.pin_to_primary(redis_session, email)
         return user
 
     async def _on_auth0_provider_create_user(
@@ -107,45 +473,197 @@ class UserService:
         email: str,
         provider: str,
     ):
-        if provider == "auth0":
-            return await self.add_user(
-                SignUpRequestSchema(
-                    email=email, password=fake.password(), firstname="", lastname=""
-                ),
-                redis_session,
-                psql_session,
+        """
+        Provisions an Auth0 user. Concurrent requests of the same new user
+        in this worker wait for the first one's result instead of querying the db.
+        """
+        if provider != "auth0":
+            return None
+        provisioning = _auth0_provisioning.get(email)
+        if provisioning is not None:
+            user = await asyncio.shield(provisioning)
+            if isinstance(user, dict):
+                return user
+            return await self._provision_auth0_user(redis_session, psql_session, email)
+        provisioning = asyncio.get_running_loop().create_future()
+        _auth0_provisioning[email] = provisioning
+        user = None
+        try:
+            user = await self._provision_auth0_user(redis_session, psql_session, email)
+            return user
+        finally:
+            del _auth0_provisioning[email]
+            provisioning.set_result(user)
+
+    async def _get_tokens_response(
+        self, redis_session: Redis, user: dict, session_id: str, refresh_token: str
+    ) -> Dict:
+        claims = {"sid": session_id}
+        if settings.ACCESS_TOKEN_EMBED_CLAIMS:
+            permissions_version = await self.users_redis_repo.issue_permissions_version(
+                redis_session, user["id"]
             )
+            # Claims without a stored version couldn't be invalidated, e.g. on demotion.
+            if permissions_version is not None:
+                claims |= get_authorization_claims(user, permissions_version)
+        return {
+            "access_token": create_access_token(user["email"], extra_claims=claims),
+            "token_type": "bearer",
+            "refresh_token": refresh_token,
+            "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        }
+
+    async def _create_session(
+        self, redis_session: Redis, user: dict, user_agent: str | None = None
+    ) -> Dict:
+        """Stores a new refresh token session and returns the token pair for it."""
+        session_id, refresh_token, refresh_token_hash = create_refresh_token(user["id"])
+        now = datetime.utcnow().isoformat()
+        await self.sessions_redis_repo.add_one(
+            {
+                "id": session_id,
+                "user_id": user["id"],
+                "refresh_token_hash": refresh_token_hash,
+                "user_agent": user_agent,
+                "created_at": now,
+                "refreshed_at": now,
+            },
+            redis_session,
+        )
+        return await self._get_tokens_response(
+            redis_session, user, session_id, refresh_token
+        )
 
     async def login(
         self,
         redis_session: Redis,
         psql_session: AsyncSession,
         login_data,
+        user_agent: str | None = None,
     ) -> Dict | None:
-        return {
-            "access_token": create_access_token(
-                (
-                    await self._login_and_authenticaticate(
-                        redis_session,
-                        psql_session,
-                        login_data.model_dump(),
-                    )
-                )["email"]
-            ),
-            "token_type": "bearer",
-        }
+        user = await self._login_and_authenticaticate(
+            redis_session,
+            psql_session,
+            login_data.model_dump(),
+        )
+        return await self._create_session(redis_session, user, user_agent)
+
+    async def refresh_tokens(
+        self,
+        redis_session: Redis,
+        psql_session: AsyncSession,
+        refresh_token: str,
+    ) -> Dict:
+        """Rotates the refresh token and issues a new access token for its session."""
+        parsed_token = parse_refresh_token(refresh_token)
+        if parsed_token is None:
+            raise invalid_refresh_token_error()
+        session_id, refresh_token_hash = parsed_token
+        _, new_refresh_token, new_refresh_token_hash = create_refresh_token(
+            None, session_id
+        )
+        status, session = await self.sessions_redis_repo.update_one(
+            redis_session,
+            session_id,
+            refresh_token_hash,
+            new_refresh_token_hash,
+            datetime.utcnow().isoformat(),
+        )
+        if status != 1:
+            raise invalid_refresh_token_error()
+        user = await self.get_user(redis_session, psql_session, session["user_id"])
+        if user is None:
+            await self.sessions_redis_repo.delete_one(
+                redis_session, session_id, session["user_id"]
+            )
+            raise invalid_refresh_token_error()
+        return await self._get_tokens_response(
+            redis_session, user, session_id, new_refresh_token
+        )
+
+    async def get_sessions(
+        self,
+        redis_session: Redis,
+        psql_session: AsyncSession,
+        token: str,
+    ) -> Dict[str, List]:
+        claims = verify(token)
+        current_user = await self.get_current_user_claims(
+            redis_session, psql_session, token, claims=claims
+        )
+        current_session_id = claims.get("sid")
+        sessions = await self.sessions_redis_repo.find_all(
+            redis_session, current_user["id"]
+        )
+        for session in sessions:
+            session["is_current"] = session["id"] == current_session_id
+        return {"sessions": sorted(sessions, key=lambda session: session["created_at"])}
+
+    async def revoke_session(
+        self,
+        redis_session: Redis,
+        psql_session: AsyncSession,
+        token: str,
+        session_id: str,
+    ) -> bool | None:
+        current_user = await self.get_current_user_claims(
+            redis_session, psql_session, token
+        )
+        session = await self.sessions_redis_repo.find_one(redis_session, session_id)
+        if session is None or session["user_id"] != current_user["id"]:
+            return None
+        return await self.sessions_redis_repo.delete_one(
+            redis_session, session_id, current_user["id"]
+        )
 
     async def get_current_user(
         self,
         redis_session: Redis,
         psql_session: AsyncSession,
         token: str,
+        psql_read_session: AsyncSession | None = None,
     ) -> Dict:
+        """Looks the user up in `psql_read_session` if given, provisions on the primary."""
         email, provider = get_current_user_email(token)
         return filter_response_for_401_error(
-            await self.get_user(redis_session, psql_session, None, email)
+            await self.get_user(
+                redis_session, psql_read_session or psql_session, None, email
+            )
             or await self._on_auth0_provider_create_user(
                 redis_session, psql_session, email, provider
             ),
             User.__tablename__,
         )
+
+    async def get_current_user_claims(
+        self,
+        redis_session: Redis,
+        psql_session: AsyncSession,
+        token: str,
+        psql_read_session: AsyncSession | None = None,
+        claims: dict | None = None,
+    ) -> Dict:
+        """
+        Returns current user's `id`, `email` and `is_superuser` for permission checks.
+
+        Embedded claims are trusted while their permissions version is current,
+        otherwise the full user is loaded. `claims` of an already verified token
+        skip verifying it again.
+        """
+        claims = claims or verify(token)
+        if "uid" in claims:
+            permissions_version = await self.users_redis_repo.get_permissions_version(
+                redis_session, claims["uid"]
+            )
+            if (
+                permissions_version is not None
+                and claims.get("pv") == permissions_version
+            ):
+                return {
+                    "id": claims["uid"],
+                    "email": claims["sub"],
+                    "is_superuser": claims["is_superuser"],
+                }
+        return await self.get_current_user(
+            redis_session, psql_session, token, psql_read_session
+        )
@@ -1,8 +1,108 @@
 """Contains project's loggers."""
 
+import json
 import logging
+import random
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
 
 
 def get_logger(module_name: str):
     logger = logging.getLogger(module_name)
     return logger
+
+
+class LocalQueueHandler(QueueHandler):
+    """
+    Enqueues records as they are, without formatting them in the caller.
+
+    The queue never leaves the process, so message merging and exception
+    rendering can be safely left to the listener's thread.
+    """
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.enqueue(record)
+        except Exception:
+            self.handleError(record)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Drops a share of records below WARNING for the configured logger prefixes.
+
+    `rates` maps a logger name prefix (e.g. "app.repositories") to a share of
+    records to keep in the [0, 1] range. The longest matching prefix wins.
+    """
+
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._rate_by_logger: dict[str, float] = {}
+
+    def _get_rate(self, logger_name: str) -> float:
+        rate = self._rate_by_logger.get(logger_name)
+        if rate is None:
+            prefixes = [
+                prefix
+                for prefix in self.rates
+                if logger_name == prefix or logger_name.startswith(prefix + ".")
+            ]
+            rate = self.rates[max(prefixes, key=len)] if prefixes else 1.0
+            self._rate_by_logger[logger_name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._get_rate(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class JSONFormatter(logging.Formatter):
+    """Formats records as single-line JSON objects."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "timestamp": datetime.fromtimestamp(
+                record.created, tz=timezone.utc
+            ).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+
+def setup_queue_logging(
+    log_format: str = "text", sampling: dict[str, float] | None = None
+) -> QueueListener:
+    """
+    Moves root logger's handlers behind a queue, so I/O happens off the event loop.
+
+    Returns the started listener; it should be stopped on app shutdown to flush the queue.
+    """
+    root_logger = logging.getLogger()
+    handlers = [
+        handler
+        for handler in root_logger.handlers
+        if not isinstance(handler, QueueHandler)
+    ]
+    if not handlers:
+        handlers = [logging.StreamHandler()]
+    if log_format == "json":
+        for handler in handlers:
+            handler.setFormatter(JSONFormatter())
+
+    log_queue = SimpleQueue()
+    queue_handler = LocalQueueHandler(log_queue)
+    if sampling:
+        queue_handler.addFilter(SamplingFilter(sampling))
+    root_logger.handlers = [queue_handler]
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
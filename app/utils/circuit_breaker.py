@@ -0,0 +1,91 @@
+"""Contains a circuit breaker for optional dependencies such as the cache."""
+
+import asyncio
+from contextlib import suppress
+from typing import Awaitable, Callable
+
+from .app_loggers import get_logger
+from .metrics import metrics_registry
+
+
+logger = get_logger(__name__)
+
+circuit_breaker_state = metrics_registry.gauge(
+    "circuit_breaker_open", "Whether a circuit breaker skips its dependency (1) or not."
+)
+circuit_breaker_failures = metrics_registry.counter(
+    "circuit_breaker_failures_total", "Failed calls counted by a circuit breaker."
+)
+circuit_breaker_skipped_calls = metrics_registry.counter(
+    "circuit_breaker_skipped_calls_total", "Calls skipped by an open circuit breaker."
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency while its circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures, so callers skip
+    the dependency instead of waiting on it. While open, probes run in the background
+    every `probe_interval` seconds and the first one to pass closes the breaker.
+
+    A probe passes when all of its steps succeed: after the availability check,
+    steps can repair state the skipped calls left behind.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, probe_interval: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+        self.is_open = False
+        self._failures = 0
+        self._probe_steps: list[Callable[[], Awaitable]] = []
+        self._probe_task: asyncio.Task | None = None
+        circuit_breaker_state.set(0, breaker=name)
+
+    def add_probe_step(self, step: Callable[[], Awaitable]) -> None:
+        self._probe_steps.append(step)
+
+    def record_success(self) -> None:
+        self._failures = 0
+
+    def record_failure(self, error: Exception) -> None:
+        self._failures += 1
+        circuit_breaker_failures.inc(breaker=self.name)
+        if not self.is_open and self._failures >= self.failure_threshold:
+            self.is_open = True
+            circuit_breaker_state.set(1, breaker=self.name)
+            logger.warning(
+                "Circuit breaker %s is open after %s failures: %s",
+                self.name,
+                self._failures,
+                error,
+            )
+            self._probe_task = asyncio.create_task(self._probe_until_closed())
+
+    def record_skip(self, operation: str) -> None:
+        circuit_breaker_skipped_calls.inc(breaker=self.name, operation=operation)
+
+    async def _probe_until_closed(self) -> None:
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            try:
+                for step in self._probe_steps:
+                    await step()
+            except Exception as e:
+                logger.info("Circuit breaker %s probe failed: %s", self.name, e)
+                continue
+            self.is_open = False
+            self._failures = 0
+            circuit_breaker_state.set(0, breaker=self.name)
+            logger.info("Circuit breaker %s is closed.", self.name)
+            return
+
+    async def stop(self) -> None:
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._probe_task
+            self._probe_task = None
@@ -2,7 +2,7 @@
 
 from fastapi.exceptions import HTTPException
 
-from ..utils.password_hashing import verify_password
+from ..utils.password_hashing import verify_and_update_password
 
 
 def exception_message_template(key: str, message: str) -> list:
@@ -68,6 +68,16 @@ def unauthorized_wrong_credentials():
     )
 
 
+def invalid_refresh_token_error():
+    return HTTPException(
+        status_code=401,
+        detail=exception_message_template(
+            "refresh_token", "Invalid or expired refresh token!"
+        ),
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
 def permition_restriction_error(message: str):
     return HTTPException(
         status_code=401,
@@ -76,8 +86,20 @@ def permition_restriction_error(message: str):
     )
 
 
-def authentication_check(db_data, form_data, model_name) -> dict:
+def too_many_requests_error(message: str, retry_after: int):
+    return HTTPException(
+        status_code=429,
+        detail=exception_message_template("rate_limit", message),
+        headers={"Retry-After": str(retry_after)},
+    )
+
+
+def authentication_check(db_data, form_data, model_name) -> tuple[dict, str | None]:
+    """Returns authenticated data and a new password hash if the stored one is outdated."""
     filter_response_for_404_error(db_data, model_name)
-    if not verify_password(form_data["password"], db_data["hashed_password"]):
+    is_verified, new_hashed_password = verify_and_update_password(
+        form_data["password"], db_data["hashed_password"]
+    )
+    if not is_verified:
         raise unauthorized_wrong_credentials()
-    return db_data
+    return db_data, new_hashed_password
@@ -0,0 +1,70 @@
+"""Contains in-process metrics exposed in the Prometheus text format."""
+
+from collections import defaultdict
+
+
+class Metric:
+    metric_type = None
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self.values: dict[tuple, float] = defaultdict(float)
+
+    @staticmethod
+    def _labels_key(labels: dict) -> tuple:
+        return tuple(sorted(labels.items()))
+
+    def get(self, **labels) -> float:
+        return self.values.get(self._labels_key(labels), 0)
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+        for labels_key, value in self.values.items():
+            labels = ",".join(f'{key}="{label}"' for key, label in labels_key)
+            lines.append(
+                f"{self.name}{{{labels}}} {value}" if labels else f"{self.name} {value}"
+            )
+        return lines
+
+
+class Counter(Metric):
+    metric_type = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        self.values[self._labels_key(labels)] += amount
+
+
+class Gauge(Metric):
+    metric_type = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        self.values[self._labels_key(labels)] = value
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: dict[str, Metric] = {}
+
+    def _get_or_create(self, metric_class: type[Metric], name: str, description: str):
+        if name not in self.metrics:
+            self.metrics[name] = metric_class(name, description)
+        return self.metrics[name]
+
+    def counter(self, name: str, description: str) -> Counter:
+        return self._get_or_create(Counter, name, description)
+
+    def gauge(self, name: str, description: str) -> Gauge:
+        return self._get_or_create(Gauge, name, description)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics_registry = MetricsRegistry()
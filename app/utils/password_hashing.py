@@ -1,10 +1,82 @@
+"""
+Contains password hashing tools.
+
+Run as a module to calibrate the hash cost on the current machine:
+
+    python -m app.utils.password_hashing --target-ms 250
+"""
+
+from argparse import ArgumentParser
+from math import log2
+from time import perf_counter
+from passlib.registry import get_crypt_handler
+
 from ..core.settings import get_settings
 
 
 settings = get_settings()
 
+# Stored for users without a password (e.g. provisioned from Auth0), never verifies.
+UNUSABLE_PASSWORD_HASH = "!"
+
+
 def hash_password(password: str) -> str:
     return settings.pwd_context.hash(password)
 
+
 def verify_password(password: str, hashed_password: str) -> bool:
-    return settings.pwd_context.verify(password, hashed_password)
\ No newline at end of file
+    if hashed_password == UNUSABLE_PASSWORD_HASH:
+        return False
+    return settings.pwd_context.verify(password, hashed_password)
+
+
+def verify_and_update_password(
+    password: str, hashed_password: str
+) -> tuple[bool, str | None]:
+    """Returns verification result and a new hash if the stored one is outdated."""
+    if hashed_password == UNUSABLE_PASSWORD_HASH:
+        return False, None
+    return settings.pwd_context.verify_and_update(password, hashed_password)
+
+
+def measure_hash_time(scheme: str, rounds: int, samples: int = 3) -> float:
+    """Returns the fastest of `samples` hash timings in milliseconds."""
+    handler = get_crypt_handler(scheme).using(rounds=rounds)
+    timings = []
+    for _ in range(samples):
+        start = perf_counter()
+        handler.hash("calibration-password")
+        timings.append(perf_counter() - start)
+    return min(timings) * 1000
+
+
+def suggest_hash_rounds(
+    target_ms: float, scheme: str | None = None, samples: int = 3
+) -> tuple[int, float]:
+    """Returns rounds closest to the target hash time and the time measured with them."""
+    scheme = scheme or settings.PASSWORD_HASH_SCHEMES[0]
+    handler = get_crypt_handler(scheme)
+    rounds = handler.default_rounds
+    elapsed_ms = measure_hash_time(scheme, rounds, samples)
+    if handler.rounds_cost == "log2":
+        rounds += round(log2(target_ms / elapsed_ms))
+    else:
+        rounds = round(rounds * target_ms / elapsed_ms)
+    rounds = max(handler.min_rounds, min(handler.max_rounds or rounds, rounds))
+    return rounds, measure_hash_time(scheme, rounds, samples)
+
+
+def main():
+    parser = ArgumentParser(description="Suggests password hash rounds.")
+    parser.add_argument("--target-ms", type=float, default=250)
+    parser.add_argument("--scheme", default=settings.PASSWORD_HASH_SCHEMES[0])
+    parser.add_argument("--samples", type=int, default=3)
+    args = parser.parse_args()
+
+    rounds, elapsed_ms = suggest_hash_rounds(args.target_ms, args.scheme, args.samples)
+    print(f"{args.scheme}: {rounds} rounds take {elapsed_ms:.1f}ms on this machine.")
+    print(f"Set PASSWORD_HASH_ROUNDS={rounds} to apply.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Executes User statements built on every call and the repository's prebuilt ones
+against the configured database, each kind with its own `compiled_cache`,
+and reports latency, compiled forms cached and cache hits. Writes are rolled back.
+
+    python -m benchmarks.sql_statements --runs 2000
+"""
+
+import asyncio
+import logging
+from argparse import ArgumentParser
+from collections import Counter
+from itertools import count
+from sqlalchemy import select, insert, update, delete
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlalchemy.sql.expression import literal_column
+
+from app.db.psql_config import dispose_engines, get_async_engine
+from app.models.users import User
+from app.repositories.users import UserSQLARepository
+from .utils import format_report, measure_async
+
+
+def get_cases() -> dict:
+    """Maps a statement name to its per-call builder, prebuilt getter and params."""
+    table = User.__table__
+    numbers = count()
+
+    def get_data() -> dict:
+        return {
+            "email": f"bench-{next(numbers)}@example.com",
+            "hashed_password": "!",
+            "firstname": "B",
+        }
+
+    return {
+        "find_by_id": (
+            lambda params: select(table).where(table.c.id == params["id"]),
+            lambda: {"id": 1},
+        ),
+        "find_by_email": (
+            lambda params: select(table).where(table.c.email == params["email"]),
+            lambda: {"email": "bench@example.com"},
+        ),
+        "add_one": (
+            lambda params: insert(table)
+            .values(**params)
+            .returning(literal_column("*")),
+            get_data,
+        ),
+        "update_one": (
+            lambda params: update(table)
+            .where(table.c.id == params["record_id"])
+            .values(city=params["city"])
+            .returning(literal_column("*")),
+            lambda: {"record_id": -1, "city": "Kyiv"},
+        ),
+        "delete_one": (
+            lambda params: delete(table)
+            .where(table.c.id == params["record_id"])
+            .returning(table.c.id),
+            lambda: {"record_id": -1},
+        ),
+    }
+
+
+async def execute(
+    connection: AsyncConnection, stmt, params: dict | None, cache: dict, hits: Counter
+) -> None:
+    result = await connection.execute(
+        stmt, params, execution_options={"compiled_cache": cache}
+    )
+    hits[result.context.cache_hit == result.context.dialect.CACHE_HIT] += 1
+
+
+async def run(runs: int) -> None:
+    repository = UserSQLARepository()
+    async with get_async_engine().connect() as connection:
+        for name, (build, get_params) in get_cases().items():
+            built_cache, prebuilt_cache = {}, {}
+            built_hits, prebuilt_hits = Counter(), Counter()
+
+            async def execute_built():
+                await execute(
+                    connection, build(get_params()), None, built_cache, built_hits
+                )
+
+            async def execute_prebuilt():
+                await execute(
+                    connection,
+                    repository._get_stmt(name),
+                    get_params(),
+                    prebuilt_cache,
+                    prebuilt_hits,
+                )
+
+            built = await measure_async(execute_built, runs)
+            prebuilt = await measure_async(execute_prebuilt, runs)
+            print(format_report(f"{name} built per call", built))
+            print(format_report(f"{name} prebuilt", prebuilt))
+            print(
+                f"{name}: compiled forms: {len(built_cache)} built,"
+                f" {len(prebuilt_cache)} prebuilt;"
+                f" cache hits: {built_hits[True]}/{built_hits.total()} built,"
+                f" {prebuilt_hits[True]}/{prebuilt_hits.total()} prebuilt"
+            )
+            assert len(prebuilt_cache) == 1, f"{name} was compiled more than once"
+        await connection.rollback()
+    await dispose_engines()
+
+
+def main():
+    parser = ArgumentParser(description="Measures statement execution and caching.")
+    parser.add_argument("--runs", type=int, default=2000)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    asyncio.run(run(args.runs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Measures user search latency against the configured database and prints the query plan.
+
+    python -m benchmarks.user_search --query john --runs 200
+"""
+
+import asyncio
+import logging
+from argparse import ArgumentParser
+from sqlalchemy import text
+
+from app.db.psql_config import get_async_session_maker
+from app.repositories.users import UserSQLARepository
+from .utils import format_report, measure_async
+
+
+async def run(query: str, runs: int, size: int) -> None:
+    repository = UserSQLARepository()
+    async with get_async_session_maker()() as session:
+        timings = await measure_async(
+            lambda: repository.search(session, query, size, 0), runs
+        )
+        stmt = repository._get_search_stmt(query, size, 0).compile(
+            dialect=session.bind.dialect, compile_kwargs={"literal_binds": True}
+        )
+        plan = await session.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {stmt}"))
+    print(format_report(f"user search for {query!r}", timings))
+    print("\n".join(row[0] for row in plan))
+
+
+def main():
+    parser = ArgumentParser(description="Measures user search latency.")
+    parser.add_argument("--query", default="john")
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--size", type=int, default=20)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    asyncio.run(run(args.query, args.runs, args.size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Contains helpers shared by benchmarks."""
+
+from statistics import quantiles
+from time import perf_counter
+from typing import Awaitable, Callable
+
+
+async def measure_async(
+    func: Callable[[], Awaitable], runs: int, warmup_runs: int = 10
+) -> list[float]:
+    """Returns timings of `runs` awaited calls in milliseconds."""
+    for _ in range(warmup_runs):
+        await func()
+    timings = []
+    for _ in range(runs):
+        start = perf_counter()
+        await func()
+        timings.append((perf_counter() - start) * 1000)
+    return timings
+
+
+def measure(
+    func: Callable[[], object], runs: int, warmup_runs: int = 10
+) -> list[float]:
+    """Returns timings of `runs` calls in milliseconds."""
+    for _ in range(warmup_runs):
+        func()
+    timings = []
+    for _ in range(runs):
+        start = perf_counter()
+        func()
+        timings.append((perf_counter() - start) * 1000)
+    return timings
+
+
+def format_report(name: str, timings: list[float]) -> str:
+    percentiles = quantiles(timings, n=100)
+    return (
+        f"{name}: runs={len(timings)} min={min(timings):.3f}ms"
+        f" p50={percentiles[49]:.3f}ms p95={percentiles[94]:.3f}ms"
+        f" p99={percentiles[98]:.3f}ms max={max(timings):.3f}ms"
+    )
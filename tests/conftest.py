@@ -12,9 +12,12 @@ from sqlalchemy.sql.expression import literal_column
 from app.main import app
 from app.models.users import User
 from app.db.psql_config import async_session_maker
+from app.db.redis_config import open_redis_session
+from app.repositories.users import UserRedisRepository
 from app.utils.password_hashing import hash_password
 from app.core.settings import get_settings
 from app.services.jwt_handler import create_access_token
+from app.services.rate_limiter import login_rate_limiter
 
 
 fake = faker.Faker()
@@ -37,6 +40,21 @@ def event_loop():
     loop.close()
 
 
+@pytest_asyncio.fixture(scope="function", autouse=True)
+async def reset_login_rate_limiter():
+    """Every test logs in from the same client IP, so buckets start full per test."""
+    async with open_redis_session() as redis_session:
+        bucket_keys = [
+            key
+            async for key in redis_session.scan_iter(
+                match=login_rate_limiter._get_key("*", "*")
+            )
+        ]
+        if bucket_keys:
+            await redis_session.unlink(*bucket_keys)
+    yield
+
+
 @pytest_asyncio.fixture(scope="function")
 def get_random_user_data():
     def _random_user_data(
@@ -67,6 +85,12 @@ def get_random_user_data():
     return _random_user_data
 
 
+async def bump_users_generation():
+    """Users written directly to the db must invalidate cached user lists too."""
+    async with open_redis_session() as redis_session:
+        await UserRedisRepository().bump_generation(redis_session)
+
+
 @pytest_asyncio.fixture(scope="session")
 def new_user():
     async def _new_user(data: dict, user_model: type[User] = User):
@@ -79,7 +103,8 @@ def new_user():
             new_user = await session.execute(stmt)
             await session.commit()
             new_user = dict(new_user.mappings().first().items())
-            return new_user
+        await bump_users_generation()
+        return new_user
 
     return _new_user
 
@@ -90,6 +115,7 @@ def delete_user():
         async with async_session_maker() as session:
             await session.execute(delete(user_model).where(user_model.id == id))
             await session.commit()
+        await bump_users_generation()
 
     return _delete_user
 
@@ -0,0 +1,130 @@
+"""Contains tests for the app's logging setup."""
+import json
+import logging
+import pytest
+
+from app.utils.app_loggers import (
+    JSONFormatter,
+    LocalQueueHandler,
+    SamplingFilter,
+    setup_queue_logging,
+)
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+        self.messages = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+        self.messages.append(self.format(record))
+
+
+def make_record(
+    name: str, level: int = logging.INFO, msg: str = "Message %s.", args=(1,)
+):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+@pytest.fixture
+def root_handlers():
+    """Restores root logger's handlers and level replaced by a test."""
+    root_logger = logging.getLogger()
+    handlers, level = root_logger.handlers[:], root_logger.level
+    yield root_logger
+    root_logger.handlers = handlers
+    root_logger.setLevel(level)
+
+
+@pytest.mark.parametrize("rate", [0.0, 0.25, 1.0])
+def test_sampling_filter_keeps_share_of_records(monkeypatch, rate):
+    """Tests records below WARNING kept with the rate of the longest prefix."""
+    random_values = iter(i / 100 for i in range(100))
+    monkeypatch.setattr(
+        "app.utils.app_loggers.random.random", lambda: next(random_values)
+    )
+    sampling_filter = SamplingFilter({"app": 0.5, "app.repositories": rate})
+    kept = [
+        sampling_filter.filter(make_record("app.repositories.redis", logging.DEBUG))
+        for _ in range(100)
+    ]
+    assert kept.count(True) == int(rate * 100)
+    assert sampling_filter.filter(make_record("other"))
+
+
+@pytest.mark.parametrize("level", [logging.WARNING, logging.ERROR, logging.CRITICAL])
+def test_sampling_filter_never_drops_warnings(monkeypatch, level):
+    """Tests records at WARNING and above kept whatever the rate."""
+    monkeypatch.setattr("app.utils.app_loggers.random.random", lambda: 0.99)
+    sampling_filter = SamplingFilter({"app": 0.0})
+    assert sampling_filter.filter(make_record("app.services", level))
+
+
+def test_json_formatter_fields():
+    """Tests a record formatted as a JSON object with merged args."""
+    record = make_record(
+        "app.services.users", logging.WARNING, "User %s: %s.", (1, "x")
+    )
+    data = json.loads(JSONFormatter().format(record))
+    assert data.keys() == {"timestamp", "level", "logger", "message"}
+    assert data["level"] == "WARNING"
+    assert data["logger"] == "app.services.users"
+    assert data["message"] == "User 1: x."
+    assert data["timestamp"].endswith("+00:00")
+
+
+def test_json_formatter_exception():
+    """Tests an exception rendered with its traceback into `exc_info`."""
+    logger = logging.getLogger("test_json_formatter_exception")
+    handler = ListHandler()
+    handler.setFormatter(JSONFormatter())
+    logger.addHandler(handler)
+    logger.propagate = False
+    try:
+        raise ValueError("Broken.")
+    except ValueError:
+        logger.exception("Failed.")
+    finally:
+        logger.removeHandler(handler)
+    data = json.loads(handler.messages[0])
+    assert data["message"] == "Failed."
+    assert data["exc_info"].startswith("Traceback")
+    assert "ValueError: Broken." in data["exc_info"]
+
+
+def test_local_queue_handler_enqueues_record_unformatted():
+    """Tests records put in the queue with their args left for the listener."""
+    queued = []
+
+    class ListQueue:
+        def put_nowait(self, record):
+            queued.append(record)
+
+    record = make_record("app", msg="User %s: %s.", args=(1, {"id": 1}))
+    LocalQueueHandler(ListQueue()).emit(record)
+    assert queued == [record]
+    assert queued[0].msg == "User %s: %s."
+    assert queued[0].args == (1, {"id": 1})
+
+
+def test_queue_logging_flushed_on_listener_stop(root_handlers):
+    """Tests records logged before shutdown all handled once the listener stops."""
+    handler = ListHandler()
+    root_handlers.handlers = [handler]
+    root_handlers.setLevel(logging.DEBUG)
+    listener = setup_queue_logging(
+        "json", {"test_queue_logging_flushed_on_listener_stop": 0.0}
+    )
+    assert len(root_handlers.handlers) == 1
+    assert isinstance(root_handlers.handlers[0], LocalQueueHandler)
+    logger = logging.getLogger("test_queue_logging_flushed_on_listener_stop")
+    for i in range(100):
+        logger.warning("Record %s.", i)
+        logger.info("Dropped %s.", i)
+    listener.stop()
+    assert listener._thread is None
+    assert [json.loads(message)["message"] for message in handler.messages] == [
+        f"Record {i}." for i in range(100)
+    ]
@@ -0,0 +1,274 @@
+"""Contains tests for the Redis cache of users."""
+import asyncio
+import pytest
+from redis.asyncio import BlockingConnectionPool, Redis
+from redis.asyncio.cluster import RedisCluster
+from redis.crc import key_slot
+
+from app.api.dependencies import get_user_service
+from app.db import redis_config
+from app.db.psql_config import async_session_maker
+from app.db.redis_config import BlockingSentinelConnectionPool, open_redis_session
+from app.repositories.redis import CACHE_ERRORS
+from app.repositories.sessions import SessionRedisRepository
+from app.repositories.users import UserRedisRepository
+from app.services.background import BackgroundCacheWriter, background_writes
+from app.services.jwt_handler import create_refresh_token
+from app.services.rate_limiter import login_rate_limiter
+from app.utils.circuit_breaker import CircuitBreaker, circuit_breaker_state
+from .conftest import fake, settings
+
+
+def get_slot(key: str) -> int:
+    return key_slot(key.encode())
+
+
+@pytest.mark.asyncio
+async def test_fill_only_if_absent_keeps_fresher_record(new_user, get_random_user_data):
+    """Tests a warm-up batch read before an update not replacing the updated record."""
+    user = await new_user(get_random_user_data())
+    users_repo = UserRedisRepository()
+    async with open_redis_session() as redis_session:
+        await users_repo.add_one({**user, "firstname": "Updated"}, redis_session)
+        await users_repo.add_many([user], redis_session, only_if_absent=True)
+        cached_user = await users_repo.find_one(redis_session, user["id"])
+        await users_repo.delete_many([user["id"]], redis_session)
+    assert cached_user["firstname"] == "Updated"
+
+
+@pytest.mark.asyncio
+async def test_late_miss_not_hiding_created_user(new_user, get_random_user_data):
+    """Tests a db miss cached after the user was created and cached."""
+    user = await new_user(get_random_user_data())
+    users_repo = UserRedisRepository()
+    async with open_redis_session() as redis_session:
+        await users_repo.add_one(user, redis_session)
+        await users_repo.add_miss(redis_session, user["id"])
+        await users_repo.add_miss(redis_session, None, user["email"])
+        cached_by_id = await users_repo.find_one(redis_session, user["id"])
+        cached_by_email = await users_repo.find_one(redis_session, None, user["email"])
+        missed_keys = await redis_session.exists(
+            users_repo._get_miss_key(user["id"]),
+            users_repo._get_miss_key(None, user["email"]),
+        )
+        await users_repo.delete_many([user["id"]], redis_session)
+    assert cached_by_id["id"] == cached_by_email["id"] == user["id"]
+    assert missed_keys == 0
+
+
+@pytest.mark.asyncio
+async def test_delete_unlinks_record_with_email_pointer(new_user, get_random_user_data):
+    """Tests a deleted record, its pointer and its cached misses all unlinked."""
+    user = await new_user(get_random_user_data())
+    users_repo = UserRedisRepository()
+    async with open_redis_session() as redis_session:
+        await users_repo.add_one(user, redis_session)
+        cached_by_email = await users_repo.find_one(redis_session, None, user["email"])
+        await redis_session.set(users_repo._get_miss_key(user["id"]), 1)
+        await redis_session.set(users_repo._get_miss_key(None, user["email"]), 1)
+        deleted = await users_repo.delete_many([user["id"], 0], redis_session)
+        stored_keys = await redis_session.exists(
+            users_repo._get_key(user["id"]),
+            users_repo._get_email_key(user["email"]),
+            users_repo._get_miss_key(user["id"]),
+            users_repo._get_miss_key(None, user["email"]),
+        )
+    assert cached_by_email["id"] == user["id"]
+    assert deleted == 1
+    assert stored_keys == 0
+
+
+@pytest.mark.asyncio
+async def test_replica_reads_not_cached(new_user, get_random_user_data):
+    """Tests users and misses read from a replica session leaving the cache as is."""
+    user = await new_user(get_random_user_data())
+    users_repo = UserRedisRepository()
+    user_service = get_user_service()
+    async with open_redis_session() as redis_session, async_session_maker(
+        info={"read_replica": True}
+    ) as psql_session:
+        found = await user_service.get_user(redis_session, psql_session, user["id"])
+        missed = await user_service.get_user(redis_session, psql_session, 0)
+        batch = await user_service.get_users_batch(
+            redis_session, psql_session, {**user, "is_superuser": True}, [user["id"]]
+        )
+        stored_keys = await redis_session.exists(
+            users_repo._get_key(user["id"]),
+            users_repo._get_email_key(user["email"]),
+            users_repo._get_miss_key(0),
+        )
+    assert found["id"] == user["id"]
+    assert missed is None
+    assert [found["id"] for found in batch["users"]] == [user["id"]]
+    assert stored_keys == 0
+
+
+@pytest.mark.asyncio
+async def test_background_writer_drops_writes_beyond_max_pending():
+    """Tests a write scheduled while `max_pending` writes run being dropped."""
+    writer = BackgroundCacheWriter(max_concurrency=1, max_pending=1)
+    operation = fake.unique.word()
+    released = asyncio.Event()
+
+    async def blocked_write(redis_session):
+        await released.wait()
+
+    writer.schedule(operation, blocked_write)
+    writer.schedule(operation, blocked_write)
+    released.set()
+    await writer.drain(timeout=1)
+    assert background_writes.get(operation=operation, result="dropped") == 1
+    assert background_writes.get(operation=operation, result="ok") == 1
+
+
+@pytest.mark.asyncio
+async def test_background_writer_counts_failed_writes(new_user, get_random_user_data):
+    """Tests a cache fill failing on an unreachable Redis being counted as an error."""
+    user = await new_user(get_random_user_data())
+    writer = BackgroundCacheWriter(max_concurrency=1, max_pending=1)
+    operation = fake.unique.word()
+    unreachable_redis = Redis(port=1, socket_connect_timeout=0.1)
+    writer.schedule(
+        operation,
+        lambda redis_session: UserRedisRepository().add_one(
+            user, unreachable_redis, only_if_absent=True
+        ),
+    )
+    await writer.drain(timeout=1)
+    await unreachable_redis.close()
+    assert background_writes.get(operation=operation, result="error") == 1
+
+
+def test_keys_used_together_share_cluster_slots():
+    """Tests hash tags of keys read or written by one script or transaction."""
+    users_repo = UserRedisRepository()
+    email = fake.unique.email()
+    assert get_slot(users_repo._get_key(1)) == get_slot(users_repo._get_miss_key(1))
+    assert get_slot(users_repo._get_email_key(email)) == get_slot(
+        users_repo._get_miss_key(None, email)
+    )
+    assert get_slot(users_repo._get_generation_key()) == get_slot(
+        users_repo._get_list_key({"page": 1})
+    )
+    sessions_repo = SessionRedisRepository()
+    session_id, _, _ = create_refresh_token(1)
+    assert get_slot(sessions_repo._get_session_key(session_id)) == get_slot(
+        sessions_repo._get_user_sessions_key(1)
+    )
+
+
+def test_rate_limit_buckets_are_spread_by_identifier():
+    """Tests login buckets taking their cluster slot from the identifier."""
+    ips = [fake.unique.ipv4() for _ in range(10)]
+    slots = {get_slot(login_rate_limiter._get_key("ip", ip)) for ip in ips}
+    assert slots == {get_slot(f"{{{ip}}}") for ip in ips}
+    assert len(slots) > 1
+
+
+@pytest.fixture
+def redis_mode(monkeypatch):
+    """Switches `REDIS_MODE` and recreates cached clients around the test."""
+
+    def clear_clients():
+        for getter in (
+            redis_config.get_redis_pool,
+            redis_config.get_redis_cluster,
+            redis_config.get_shared_redis_client,
+        ):
+            getter.cache_clear()
+
+    def _redis_mode(mode: str):
+        monkeypatch.setattr(settings, "REDIS_MODE", mode)
+        monkeypatch.setattr(settings, "REDIS_SENTINELS", ["localhost:26379"])
+        clear_clients()
+
+    yield _redis_mode
+    clear_clients()
+
+
+@pytest.mark.parametrize(
+    "mode, pool_class, client_class",
+    [
+        ("standalone", BlockingConnectionPool, Redis),
+        ("sentinel", BlockingSentinelConnectionPool, Redis),
+        ("cluster", None, RedisCluster),
+    ],
+)
+def test_redis_mode_switch(redis_mode, mode, pool_class, client_class):
+    """Tests clients and pools created for each `REDIS_MODE`."""
+    redis_mode(mode)
+    client = redis_config.get_shared_redis_client()
+    assert isinstance(client, client_class)
+    assert redis_config.is_cluster_client(client) is (mode == "cluster")
+    if pool_class is not None:
+        pool = redis_config.get_redis_pool()
+        assert isinstance(pool, pool_class)
+        assert pool.timeout == settings.REDIS_POOL_TIMEOUT
+        assert pool.connection_kwargs["socket_timeout"] == settings.REDIS_READ_TIMEOUT
+        assert (
+            pool.connection_kwargs["socket_connect_timeout"]
+            == settings.REDIS_CONNECT_TIMEOUT
+        )
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_opens_and_closes_after_probe():
+    """Tests the breaker opening at the threshold and closing on a passed probe."""
+    breaker = CircuitBreaker(fake.unique.word(), failure_threshold=2, probe_interval=0)
+    probes = []
+
+    async def probe():
+        probes.append(len(probes))
+        if len(probes) == 1:
+            raise ConnectionError("Still unavailable.")
+
+    breaker.add_probe_step(probe)
+    breaker.record_failure(ConnectionError("Unavailable."))
+    assert not breaker.is_open
+    breaker.record_failure(ConnectionError("Unavailable."))
+    assert breaker.is_open
+    assert circuit_breaker_state.get(breaker=breaker.name) == 1
+    await asyncio.wait_for(breaker._probe_task, timeout=1)
+    assert not breaker.is_open
+    assert circuit_breaker_state.get(breaker=breaker.name) == 0
+    assert len(probes) == 2
+
+
+@pytest.mark.asyncio
+async def test_missed_write_evicted_by_next_cache_call(new_user, get_random_user_data):
+    """Tests a failed update of a cached user evicting it on the next cache call."""
+    user = await new_user(get_random_user_data())
+    users_repo = UserRedisRepository()
+    unreachable_redis = Redis(port=1, socket_connect_timeout=0.1)
+    async with open_redis_session() as redis_session:
+        await users_repo.add_one(user, redis_session)
+        version = await users_repo.issue_permissions_version(redis_session, user["id"])
+        with pytest.raises(CACHE_ERRORS):
+            await users_repo.add_one({**user, "is_superuser": True}, unreachable_redis)
+        cached_user = await users_repo.find_one(redis_session, user["id"])
+        new_version = await users_repo.get_permissions_version(
+            redis_session, user["id"]
+        )
+    await unreachable_redis.close()
+    assert cached_user is None
+    assert new_version != version
+
+
+@pytest.mark.asyncio
+async def test_missed_write_eviction_clears_cached_misses(
+    new_user, get_random_user_data
+):
+    """Tests a failed fill of a created user removing misses cached before it."""
+    user = await new_user(get_random_user_data())
+    users_repo = UserRedisRepository()
+    unreachable_redis = Redis(port=1, socket_connect_timeout=0.1)
+    async with open_redis_session() as redis_session:
+        await users_repo.add_miss(redis_session, user["id"])
+        await users_repo.add_miss(redis_session, None, user["email"])
+        with pytest.raises(CACHE_ERRORS):
+            await users_repo.add_one(user, unreachable_redis)
+        cached_by_id = await users_repo.find_one(redis_session, user["id"])
+        cached_by_email = await users_repo.find_one(redis_session, None, user["email"])
+    await unreachable_redis.close()
+    assert cached_by_id is None
+    assert cached_by_email is None
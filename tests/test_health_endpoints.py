@@ -1,6 +1,8 @@
 """Contains tests for health endpoints."""
 import pytest
 
+from app.services import health
+
 
 @pytest.mark.asyncio
 async def test_retrive_app_check_health(ac_client):
@@ -24,3 +26,43 @@ async def test_retrive_redis_check_health(ac_client):
     response = await ac_client.get("/api/health/redis")
     assert response.status_code == 200
     assert response.json() == {"status_code": 200, "detail": "ok", "result": "working"}
+
+
+@pytest.mark.asyncio
+async def test_retrive_live_check_health(ac_client):
+    """Tests GET on app's liveness endpoint with a successful retrieval."""
+    response = await ac_client.get("/api/health/live")
+    assert response.status_code == 200
+    assert response.json() == {"status_code": 200, "detail": "ok", "result": "working"}
+
+
+@pytest.mark.asyncio
+async def test_retrive_ready_check_health(ac_client):
+    """Tests GET on app's readiness endpoint: checks, latencies and cached result."""
+    response = await ac_client.get("/api/health/ready")
+    assert response.status_code == 200
+    assert response.json()["ready"] is True
+    for name in ("psql", "redis"):
+        assert response.json()["checks"][name]["ok"] is True
+        assert response.json()["checks"][name]["latency_ms"] >= 0
+    assert "psql" in response.json()["pools"]
+
+    response = await ac_client.get("/api/health/ready")
+    assert response.json()["cached"] is True
+
+
+@pytest.mark.asyncio
+async def test_ready_check_health_without_redis(ac_client, monkeypatch):
+    """Tests app's readiness with Redis down: reported, but the app stays ready."""
+
+    async def check_redis():
+        raise ConnectionError("Redis is unavailable.")
+
+    monkeypatch.setattr(health, "check_redis", check_redis)
+    monkeypatch.setattr(health, "_ready_cache", None)
+    response = await ac_client.get("/api/health/ready")
+    assert response.status_code == 200
+    assert response.json()["ready"] is True
+    assert response.json()["checks"]["psql"]["ok"] is True
+    assert response.json()["checks"]["redis"]["ok"] is False
+    assert response.json()["checks"]["redis"]["error"] == "Redis is unavailable."
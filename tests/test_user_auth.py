@@ -2,11 +2,24 @@
 import asyncio
 import re
 import pytest
+from datetime import datetime, timedelta
 from httpx import Response
+from jose import jwt
 from json import loads, dumps
+from passlib.registry import get_crypt_handler
+from sqlalchemy import func, select, update
 
-from .conftest import fake
-from app.schemas.users import UserSchema
+from .conftest import fake, settings
+from app.db.psql_config import async_session_maker
+from app.db.redis_config import open_redis_session, redis_circuit_breaker
+from app.models.users import User
+from app.repositories.sessions import SessionRedisRepository
+from app.repositories.users import UserRedisRepository
+from app.schemas.users import (
+    UserSchema,
+    SignUpRequestSchema,
+    UserUpdateRequestSchema,
+)
 
 
 @pytest.mark.asyncio
@@ -35,6 +48,23 @@ async def test_login_unknown_user(ac_client):
     assert response.json()["detail"][0]["msg"] == "User not found!"
 
 
+@pytest.mark.asyncio
+async def test_login_user_created_after_unknown_user_login(
+    ac_client, get_random_user_data
+):
+    """Tests that a cached unknown email is forgotten on sign up: POST -> 404, 201, 200"""
+    user_data = SignUpRequestSchema(**get_random_user_data())
+    login_payload = dumps({"email": user_data.email, "password": user_data.password})
+    response: Response = await ac_client.post(url="/api/auth/login", data=login_payload)
+    assert response.status_code == 404
+    response: Response = await ac_client.post(
+        url="/api/users/", data=user_data.model_dump_json()
+    )
+    assert response.status_code == 201
+    response: Response = await ac_client.post(url="/api/auth/login", data=login_payload)
+    assert response.status_code == 200
+
+
 @pytest.mark.asyncio
 async def test_login_existing_user_with_wrong_password(
     ac_client, new_user, get_random_user_data
@@ -72,6 +102,249 @@ async def test_login_with_invalid_user_email(ac_client):
     )
 
 
+@pytest.mark.asyncio
+async def test_login_rate_limited_by_email(ac_client):
+    """Tests login attempts over the email's limit: POST -> 429"""
+    payload = dumps({"email": fake.unique.email(), "password": fake.unique.password()})
+    for _ in range(settings.LOGIN_RATE_LIMIT_EMAIL_CAPACITY):
+        response: Response = await ac_client.post(url="/api/auth/login", data=payload)
+        assert response.status_code == 404
+    response: Response = await ac_client.post(url="/api/auth/login", data=payload)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+    assert response.json()["detail"][0]["loc"][0] == "rate_limit"
+
+
+@pytest.mark.asyncio
+async def test_login_rehashes_outdated_password_hash(
+    ac_client, new_user, get_random_user_data, monkeypatch
+):
+    """Tests login with a hash made at an old cost: POST -> 200, hash is replaced"""
+    monkeypatch.setattr(settings, "PASSWORD_HASH_ROUNDS", 5)
+    # Settings reject unknown attributes, so the cached context is replaced in
+    # `__dict__`; undoing it drops the test's context and rebuilds the default one.
+    monkeypatch.setitem(
+        settings.__dict__, "pwd_context", type(settings).pwd_context.func(settings)
+    )
+    user_data = get_random_user_data()
+    password = user_data["password"]
+    user = await new_user(user_data)
+    old_hash = get_crypt_handler("bcrypt").using(rounds=4).hash(password)
+    async with async_session_maker() as session:
+        await session.execute(
+            update(User).where(User.id == user["id"]).values(hashed_password=old_hash)
+        )
+        await session.commit()
+    response: Response = await ac_client.post(
+        url="/api/auth/login",
+        data=dumps({"email": user["email"], "password": password}),
+    )
+    assert response.status_code == 200
+    async with async_session_maker() as session:
+        new_hash = await session.scalar(
+            select(User.hashed_password).where(User.id == user["id"])
+        )
+    assert new_hash != old_hash
+    assert not settings.pwd_context.needs_update(new_hash)
+    assert settings.pwd_context.verify(password, new_hash)
+
+
+@pytest.mark.asyncio
+async def test_refresh_token_rotation(ac_client, new_user, get_random_user_data):
+    """Tests refresh token rotation and reuse of a rotated token: POST -> 200, 401"""
+    user_data = get_random_user_data()
+    password = user_data["password"]
+    user = await new_user(user_data)
+    login_response: Response = await ac_client.post(
+        url="/api/auth/login",
+        data=dumps({"email": user["email"], "password": password}),
+    )
+    refresh_token = login_response.json()["refresh_token"]
+    response: Response = await ac_client.post(
+        url="/api/auth/refresh", data=dumps({"refresh_token": refresh_token})
+    )
+    assert response.status_code == 200
+    assert isinstance(response.json()["access_token"], str)
+    assert response.json()["refresh_token"] != refresh_token
+
+    response: Response = await ac_client.post(
+        url="/api/auth/refresh", data=dumps({"refresh_token": refresh_token})
+    )
+    assert response.status_code == 401
+    assert response.json()["detail"][0]["msg"] == "Invalid or expired refresh token!"
+
+
+@pytest.mark.asyncio
+async def test_refresh_token_rotation_extends_user_sessions(
+    ac_client, new_user, get_random_user_data
+):
+    """Tests a refreshed session staying listed after the login's expiry: POST -> 200"""
+    user_data = get_random_user_data()
+    password = user_data["password"]
+    user = await new_user(user_data)
+    tokens = (
+        await ac_client.post(
+            url="/api/auth/login",
+            data=dumps({"email": user["email"], "password": password}),
+        )
+    ).json()
+    sessions_repo = SessionRedisRepository()
+    async with open_redis_session() as redis_session:
+        await redis_session.expire(sessions_repo._get_user_sessions_key(user["id"]), 10)
+    response: Response = await ac_client.post(
+        url="/api/auth/refresh",
+        data=dumps({"refresh_token": tokens["refresh_token"]}),
+    )
+    assert response.status_code == 200
+    async with open_redis_session() as redis_session:
+        ttl = await redis_session.ttl(sessions_repo._get_user_sessions_key(user["id"]))
+    assert ttl > 10
+
+
+@pytest.mark.asyncio
+async def test_list_and_revoke_sessions(ac_client, new_user, get_random_user_data):
+    """Tests listing and revoking current user's sessions: GET -> 200, DELETE -> 204"""
+    user_data = get_random_user_data()
+    password = user_data["password"]
+    user = await new_user(user_data)
+    tokens = (
+        await ac_client.post(
+            url="/api/auth/login",
+            data=dumps({"email": user["email"], "password": password}),
+        )
+    ).json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    response: Response = await ac_client.get("/api/auth/sessions", headers=headers)
+    assert response.status_code == 200
+    sessions = response.json()["sessions"]
+    assert len(sessions) == 1
+    assert sessions[0]["is_current"] is True
+
+    response: Response = await ac_client.delete(
+        f"/api/auth/sessions/{sessions[0]['id']}", headers=headers
+    )
+    assert response.status_code == 204
+    response: Response = await ac_client.post(
+        url="/api/auth/refresh",
+        data=dumps({"refresh_token": tokens["refresh_token"]}),
+    )
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_embedded_claims_reloaded_after_permissions_version_eviction(
+    ac_client, new_user, get_random_user_data
+):
+    """Tests a superuser demoted after the version's eviction: GET -> 401"""
+    user_data = get_random_user_data(is_superuser=True, is_active=True)
+    password = user_data["password"]
+    user = await new_user(user_data)
+    tokens = (
+        await ac_client.post(
+            url="/api/auth/login",
+            data=dumps({"email": user["email"], "password": password}),
+        )
+    ).json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    users_repo = UserRedisRepository()
+    async with open_redis_session() as redis_session:
+        await redis_session.unlink(users_repo._get_permissions_version_key(user["id"]))
+        await users_repo.delete_many([user["id"]], redis_session)
+    async with async_session_maker() as session:
+        await session.execute(
+            update(User).where(User.id == user["id"]).values(is_superuser=False)
+        )
+        await session.commit()
+    response: Response = await ac_client.get("/api/users/", headers=headers)
+    assert response.status_code == 401
+    assert response.json()["detail"][0]["msg"] == "You have no access to this resource!"
+
+
+@pytest.mark.asyncio
+async def test_login_with_open_circuit_breaker_embeds_no_claims(
+    ac_client, new_user, get_random_user_data, monkeypatch
+):
+    """Tests a superuser logged in during a cache outage, then demoted: GET -> 401"""
+    user_data = get_random_user_data(is_superuser=True, is_active=True)
+    password = user_data["password"]
+    user = await new_user(user_data)
+    monkeypatch.setattr(redis_circuit_breaker, "is_open", True)
+    tokens = (
+        await ac_client.post(
+            url="/api/auth/login",
+            data=dumps({"email": user["email"], "password": password}),
+        )
+    ).json()
+    assert "uid" not in jwt.get_unverified_claims(tokens["access_token"])
+    async with async_session_maker() as session:
+        await session.execute(
+            update(User).where(User.id == user["id"]).values(is_superuser=False)
+        )
+        await session.commit()
+    response: Response = await ac_client.get(
+        "/api/users/",
+        headers={"Authorization": f"Bearer {tokens['access_token']}"},
+    )
+    assert response.status_code == 401
+    assert response.json()["detail"][0]["msg"] == "You have no access to this resource!"
+
+
+def create_auth0_like_jwt(email: str) -> str:
+    """Auth0 tokens are told apart by a list audience, see `get_current_user_email`."""
+    return jwt.encode(
+        {
+            "sub": email,
+            "aud": [settings.API_AUDIENCE, f"https://{settings.DOMAIN}/userinfo"],
+            "iss": settings.ISSUER,
+            "exp": datetime.utcnow() + timedelta(minutes=1),
+        },
+        key=settings.SECRET_KEY_PRIVATE,
+        algorithm=settings.ALGORITHMS,
+    )
+
+
+@pytest.mark.asyncio
+async def test_concurrent_auth0_user_provisioning(ac_client, delete_user):
+    """Tests concurrent first requests of a new Auth0 user: GET -> 200, one User"""
+    email = fake.unique.email()
+    headers = {"Authorization": f"Bearer {create_auth0_like_jwt(email)}"}
+    responses = await asyncio.gather(
+        *(ac_client.get("/api/users/me", headers=headers) for _ in range(5))
+    )
+    assert [response.status_code for response in responses] == [200] * 5
+    assert len({response.json()["id"] for response in responses}) == 1
+    async with async_session_maker() as session:
+        stored_users = await session.scalar(
+            select(func.count()).select_from(User).where(User.email == email)
+        )
+    assert stored_users == 1
+
+    response: Response = await ac_client.post(
+        url="/api/auth/login",
+        data=dumps({"email": email, "password": fake.unique.password()}),
+    )
+    assert response.status_code == 401
+    await delete_user(responses[0].json()["id"])
+
+
+@pytest.mark.asyncio
+async def test_update_auth0_user_as_itself(ac_client, delete_user):
+    """Tests PUT an Auth0 user's own allowed fields: GET -> 200, PUT -> 200"""
+    headers = {"Authorization": f"Bearer {create_auth0_like_jwt(fake.unique.email())}"}
+    user = (await ac_client.get("/api/users/me", headers=headers)).json()
+    payload = {
+        **{key: user[key] for key in UserUpdateRequestSchema.model_fields},
+        "password": fake.unique.password(),
+        "firstname": fake.unique.first_name(),
+    }
+    response: Response = await ac_client.put(
+        url=f"/api/users/{user['id']}", data=dumps(payload), headers=headers
+    )
+    await delete_user(user["id"])
+    assert response.status_code == 200
+    assert response.json()["firstname"] == payload["firstname"]
+
+
 # ______________________________________________________________________________
 
 
@@ -25,6 +25,22 @@ async def test_retrive_user_list_as_regular_user(
     assert response.json()["detail"][0]["msg"] == "You have no access to this resource!"
 
 
+@pytest.mark.asyncio
+async def test_search_users_as_regular_user(
+    ac_client, new_user, get_random_user_data, create_jwt_localy
+):
+    """Tests GET a User search as a regular user. Access denied (401)."""
+    user = await new_user(get_random_user_data(is_superuser=False))
+    user_jwt = await create_jwt_localy(user["email"])
+    response: Response = await ac_client.get(
+        "/api/users/search",
+        params={"q": user["lastname"]},
+        headers={"Authorization": f"Bearer {user_jwt}"},
+    )
+    assert response.status_code == 401
+    assert response.json()["detail"][0]["msg"] == "You have no access to this resource!"
+
+
 # ______________________________________________________________________________
 
 
@@ -164,6 +180,34 @@ async def test_update_restricted_fields_for_user_as_regular_user(
     )
 
 
+@pytest.mark.asyncio
+async def test_patch_user_as_regular_user(
+    ac_client, new_user, get_random_user_data, create_jwt_localy
+):
+    """Tests PATCH a User's allowed and restricted fields as a regular user."""
+    user = await new_user(get_random_user_data(is_superuser=False))
+    user_jwt = await create_jwt_localy(user["email"])
+    response: Response = await ac_client.patch(
+        url=f"/api/users/{user['id']}",
+        json={"firstname": "Patched", "city": user["city"]},
+        headers={"Authorization": f"Bearer {user_jwt}"},
+    )
+    assert response.status_code == 200
+    assert response.json()["firstname"] == "Patched"
+    assert response.json()["lastname"] == user["lastname"]
+
+    response: Response = await ac_client.patch(
+        url=f"/api/users/{user['id']}",
+        json={"city": fake.unique.word()},
+        headers={"Authorization": f"Bearer {user_jwt}"},
+    )
+    assert response.status_code == 401
+    assert (
+        response.json()["detail"][0]["msg"]
+        == "You are not allowed to change any User field except for your password, firstname and lastname!"
+    )
+
+
 @pytest.mark.asyncio
 async def test_update_another_user_as_regular_user(
     ac_client, new_user, get_random_user_data, create_jwt_localy
@@ -255,3 +299,30 @@ async def test_delete_user_as_regular_user_miss(
     )
     assert response.status_code == 401
     assert response.json()["detail"][0]["msg"] == "You have no access to this resource!"
+
+
+@pytest.mark.asyncio
+async def test_retrive_users_batch_as_regular_user(
+    ac_client, new_user, get_random_user_data, create_jwt_localy
+):
+    """Tests POST a User batch as a regular user. Other Users are forbidden."""
+    user_one = await new_user(get_random_user_data(is_superuser=False))
+    user_two = await new_user(
+        get_random_user_data(
+            is_superuser=False,
+            email=fake.unique.email(),
+            phone=fake.unique.phone_number()[:12],
+        )
+    )
+    user_jwt = await create_jwt_localy(user_one["email"])
+    response: Response = await ac_client.post(
+        url="/api/users/batch",
+        json={"ids": [user_one["id"], user_two["id"], user_one["id"]]},
+        headers={"Authorization": f"Bearer {user_jwt}"},
+    )
+    assert response.status_code == 200
+    assert response.json() == {
+        "users": [loads(UserSchema(**user_one).model_dump_json())],
+        "not_found": [],
+        "forbidden": [user_two["id"]],
+    }
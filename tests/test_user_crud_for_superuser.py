@@ -5,7 +5,12 @@ Requests from a superuser.
 import pytest
 from httpx import Response
 from json import loads, dumps
+from sqlalchemy import select, text
 
+from app.db.psql_config import async_session_maker
+from app.db.redis_config import open_redis_session
+from app.models.users import User
+from app.repositories.users import UserRedisRepository
 from app.schemas.users import UserSchema, SignUpRequestSchema, UserUpdateRequestSchema
 from .conftest import fake
 
@@ -26,6 +31,179 @@ async def test_retrive_user_list_as_superuser(
     assert user in response.json()["users"]
 
 
+@pytest.mark.asyncio
+async def test_filter_user_list_as_superuser(
+    ac_client, new_user, get_random_user_data, create_jwt_localy
+):
+    """Tests GET a User list filtered by city and email, newest first."""
+    user = await new_user(get_random_user_data(is_superuser=True))
+    user_jwt = await create_jwt_localy(user["email"])
+    city = f"City {fake.unique.uuid4()}"
+    filtered_users = [
+        await new_user(
+            get_random_user_data(
+                email=fake.unique.email(),
+                phone=fake.unique.phone_number()[:12],
+                city=city,
+            )
+        )
+        for _ in range(2)
+    ]
+    filtered_users = [
+        loads(UserSchema(**filtered_user).model_dump_json())
+        for filtered_user in reversed(filtered_users)
+    ]
+    response: Response = await ac_client.get(
+        "/api/users/",
+        params={"city": city, "sort_by": "created_at", "order": "desc"},
+        headers={"Authorization": f"Bearer {user_jwt}"},
+    )
+    assert response.status_code == 200
+    assert response.json()["users"] == filtered_users
+
+    response: Response = await ac_client.get(
+        "/api/users/",
+        params={"email": filtered_users[0]["email"].upper()},
+        headers={"Authorization": f"Bearer {user_jwt}"},
+    )
+    assert response.status_code == 200
+    assert response.json()["users"] == filtered_users[:1]
+
+
+@pytest.mark.asyncio
+async def test_retrive_user_list_projection_as_superuser(
+    ac_client, new_user, get_random_user_data, create_jwt_localy
+):
+    """Tests GET a User list with only the requested fields as a superuser."""
+    user = await new_user(get_random_user_data(is_superuser=True))
+    user_jwt = await create_jwt_localy(user["email"])
+    response: Response = await ac_client.get(
+        "/api/users/",
+        params={"email": user["email"], "fields": ["email", "city"]},
+        headers={"Authorization": f"Bearer {user_jwt}"},
+    )
+    assert response.status_code == 200
+    assert response.json()["users"] == [
+        {"id": user["id"], "email": user["email"], "city": user["city"]}
+    ]
+
+
+@pytest.mark.asyncio
+async def test_cached_user_list_invalidated_on_update(
+    ac_client, new_user, get_random_user_data, create_jwt_localy
+):
+    """Tests that a cached User list is refreshed after a User is patched."""
+    user = await new_user(get_random_user_data(is_superuser=True))
+    user_jwt = await create_jwt_localy(user["email"])
+    city = f"City {fake.unique.uuid4()}"
+    params = {"city": city, "fields": ["city"]}
+    response: Response = await ac_client.get(
+        "/api/users/", params=params, headers={"Authorization": f"Bearer {user_jwt}"}
+    )
+    assert response.json()["users"] == []
+
+    response: Response = await ac_client.patch(
+        url=f"/api/users/{user['id']}",
+        json={"city": city},
+        headers={"Authorization": f"Bearer {user_jwt}"},
+    )
+    assert response.status_code == 200
+    response: Response = await ac_client.get(
+        "/api/users/", params=params, headers={"Authorization": f"Bearer {user_jwt}"}
+    )
+    assert response.json()["users"] == [{"id": user["id"], "city": city}]
+
+
+@pytest.mark.asyncio
+async def test_count_users_as_superuser(
+    ac_client, new_user, get_random_user_data, create_jwt_localy
+):
+    """Tests GET exact filtered and estimated User counts as a superuser."""
+    user = await new_user(get_random_user_data(is_superuser=True))
+    user_jwt = await create_jwt_localy(user["email"])
+    city = f"City {fake.unique.uuid4()}"
+    await new_user(
+        get_random_user_data(
+            email=fake.unique.email(),
+            phone=fake.unique.phone_number()[:12],
+            city=city,
+        )
+    )
+    response: Response = await ac_client.get(
+        "/api/users/count",
+        params={"city": city, "estimate": True},
+        headers={"Authorization": f"Bearer {user_jwt}"},
+    )
+    assert response.status_code == 200
+    assert response.json() == {"count": 1, "estimated": False}
+
+    # The planner has no estimate for a table that was never analyzed.
+    async with async_session_maker() as session:
+        await session.execute(text('ANALYZE "User"'))
+        await session.commit()
+    response: Response = await ac_client.get(
+        "/api/users/count",
+        params={"estimate": True},
+        headers={"Authorization": f"Bearer {user_jwt}"},
+    )
+    assert response.status_code == 200
+    assert response.json()["estimated"] is True
+    assert response.json()["count"] >= 0
+
+
+@pytest.mark.asyncio
+async def test_search_users_as_superuser(
+    ac_client, new_user, get_random_user_data, create_jwt_localy
+):
+    """Tests GET a User search by a part of the city as a superuser."""
+    user = await new_user(get_random_user_data(is_superuser=True))
+    user_jwt = await create_jwt_localy(user["email"])
+    city_part = fake.unique.uuid4()
+    searched_user = await new_user(
+        get_random_user_data(
+            email=fake.unique.email(),
+            phone=fake.unique.phone_number()[:12],
+            city=f"City {city_part} upon Sea",
+        )
+    )
+    searched_user = loads(UserSchema(**searched_user).model_dump_json())
+    response: Response = await ac_client.get(
+        "/api/users/search",
+        params={"q": city_part, "size": 5},
+        headers={"Authorization": f"Bearer {user_jwt}"},
+    )
+    assert response.status_code == 200
+    assert response.json()["total"] >= 1
+    assert response.json()["page"] == 1
+    assert response.json()["size"] == 5
+    assert response.json()["users"][0] == searched_user
+
+
+@pytest.mark.asyncio
+async def test_search_users_page_past_end_as_superuser(
+    ac_client, new_user, get_random_user_data, create_jwt_localy
+):
+    """Tests GET a User search page past the last one keeping the total."""
+    user = await new_user(get_random_user_data(is_superuser=True))
+    user_jwt = await create_jwt_localy(user["email"])
+    city_part = fake.unique.uuid4()
+    await new_user(
+        get_random_user_data(
+            email=fake.unique.email(),
+            phone=fake.unique.phone_number()[:12],
+            city=f"City {city_part} upon Sea",
+        )
+    )
+    response: Response = await ac_client.get(
+        "/api/users/search",
+        params={"q": city_part, "page": 3, "size": 5},
+        headers={"Authorization": f"Bearer {user_jwt}"},
+    )
+    assert response.status_code == 200
+    assert response.json()["users"] == []
+    assert response.json()["total"] >= 1
+
+
 # ______________________________________________________________________________
 
 
@@ -98,6 +276,69 @@ async def test_update_user_as_superuser(
         assert response.json()[key] == value
 
 
+@pytest.mark.asyncio
+async def test_patch_another_user_as_superuser(
+    ac_client, new_user, get_random_user_data, create_jwt_localy
+):
+    """Tests PATCH only a city of another User as a superuser."""
+    user = await new_user(get_random_user_data(is_superuser=True))
+    another_user = await new_user(
+        get_random_user_data(
+            email=fake.unique.email(), phone=fake.unique.phone_number()[:12]
+        )
+    )
+    user_jwt = await create_jwt_localy(user["email"])
+    city = fake.unique.city()
+    response: Response = await ac_client.patch(
+        url=f"/api/users/{another_user['id']}",
+        json={"city": city},
+        headers={"Authorization": f"Bearer {user_jwt}"},
+    )
+    another_user = loads(UserSchema(**another_user).model_dump_json())
+    assert response.status_code == 200
+    assert response.json()["city"] == city
+    for key in ("email", "phone", "firstname", "lastname", "links", "is_superuser"):
+        assert response.json()[key] == another_user[key]
+
+    response: Response = await ac_client.patch(
+        url="/api/users/999999",
+        json={"city": city},
+        headers={"Authorization": f"Bearer {user_jwt}"},
+    )
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_patch_user_with_stale_cache_as_superuser(
+    ac_client, new_user, get_random_user_data, create_jwt_localy
+):
+    """Tests PATCH of a field the stale cached copy already shows as patched."""
+    user = await new_user(get_random_user_data(is_superuser=True))
+    another_user = await new_user(
+        get_random_user_data(
+            email=fake.unique.email(), phone=fake.unique.phone_number()[:12]
+        )
+    )
+    user_jwt = await create_jwt_localy(user["email"])
+    city = fake.unique.city()
+    async with open_redis_session() as redis_session:
+        await UserRedisRepository().add_one(
+            {**another_user, "city": city}, redis_session
+        )
+    response: Response = await ac_client.patch(
+        url=f"/api/users/{another_user['id']}",
+        json={"city": city},
+        headers={"Authorization": f"Bearer {user_jwt}"},
+    )
+    assert response.status_code == 200
+    assert response.json()["city"] == city
+    async with async_session_maker() as session:
+        stored_city = await session.scalar(
+            select(User.city).where(User.id == another_user["id"])
+        )
+    assert stored_city == city
+
+
 @pytest.mark.asyncio
 async def test_update_another_user_as_superuser(
     ac_client, new_user, get_random_user_data, create_jwt_localy
@@ -248,3 +489,59 @@ async def test_delete_user_as_superuser_miss(
     )
     assert response.status_code == 404
     assert response.json()["detail"][0]["msg"] == "User not found!"
+
+
+# ______________________________________________________________________________
+
+
+@pytest.mark.asyncio
+async def test_token_claims_invalidated_on_superuser_demotion(
+    ac_client, new_user, get_random_user_data
+):
+    """Tests that claims of a demoted superuser's token aren't trusted anymore."""
+    user_data = get_random_user_data(is_superuser=True)
+    password = user_data["password"]
+    user = await new_user(user_data)
+    tokens = (
+        await ac_client.post(
+            url="/api/auth/login",
+            data=dumps({"email": user["email"], "password": password}),
+        )
+    ).json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    response: Response = await ac_client.get("/api/users/", headers=headers)
+    assert response.status_code == 200
+
+    payload_dict = get_random_user_data(is_superuser=False)
+    payload_dict["phone"] = user["phone"]
+    response: Response = await ac_client.put(
+        url=f"/api/users/{user['id']}",
+        data=UserUpdateRequestSchema(**payload_dict).model_dump_json(),
+        headers=headers,
+    )
+    assert response.status_code == 200
+    response: Response = await ac_client.get("/api/users/", headers=headers)
+    assert response.status_code == 401
+    assert response.json()["detail"][0]["msg"] == "You have no access to this resource!"
+
+
+@pytest.mark.asyncio
+async def test_retrive_users_batch_as_superuser(
+    ac_client, new_user, get_random_user_data, create_jwt_localy
+):
+    """Tests POST a User batch as a superuser, twice to read it from the cache."""
+    user = await new_user(get_random_user_data(is_superuser=True))
+    user_jwt = await create_jwt_localy(user["email"])
+    user = loads(UserSchema(**user).model_dump_json())
+    for _ in range(2):
+        response: Response = await ac_client.post(
+            url="/api/users/batch",
+            json={"ids": [999999, user["id"]]},
+            headers={"Authorization": f"Bearer {user_jwt}"},
+        )
+        assert response.status_code == 200
+        assert response.json() == {
+            "users": [user],
+            "not_found": [999999],
+            "forbidden": [],
+        }
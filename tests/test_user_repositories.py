@@ -0,0 +1,94 @@
+"""Contains tests for the User db repository."""
+import asyncio
+import pytest
+from sqlalchemy import delete, func, insert, select
+
+from app.db.psql_config import async_session_maker
+from app.models.users import User
+from app.repositories.users import UserSQLARepository
+from app.utils.password_hashing import (
+    UNUSABLE_PASSWORD_HASH,
+    hash_password,
+    verify_password,
+)
+
+
+def _get_user_values(user_data: dict) -> dict:
+    user_data["hashed_password"] = hash_password(user_data.pop("password"))
+    user_data["phone"] = user_data["phone"][:12]
+    return user_data
+
+
+@pytest.mark.asyncio
+async def test_read_keeps_callers_transaction_open(get_random_user_data):
+    """Tests a read on a session with an uncommitted insert not committing it."""
+    user_data = _get_user_values(get_random_user_data())
+    users_repo = UserSQLARepository()
+    async with async_session_maker() as session:
+        await session.execute(insert(User).values(**user_data))
+        found = await users_repo.find_one(session, None, user_data["email"])
+        assert session.in_transaction()
+        await session.rollback()
+    async with async_session_maker() as session:
+        assert await users_repo.find_one(session, None, user_data["email"]) is None
+    assert found["email"] == user_data["email"]
+
+
+@pytest.mark.asyncio
+async def test_read_keeps_callers_pending_changes(get_random_user_data):
+    """Tests a read autoflushing pending changes not committing them."""
+    user_data = _get_user_values(get_random_user_data())
+    users_repo = UserSQLARepository()
+    async with async_session_maker() as session:
+        session.add(User(**user_data))
+        await users_repo.find_one(session, None, user_data["email"])
+        await session.rollback()
+    async with async_session_maker() as session:
+        assert await users_repo.find_one(session, None, user_data["email"]) is None
+
+
+@pytest.mark.asyncio
+async def test_read_ends_its_own_transaction():
+    """Tests a read on an idle session returning its connection right away."""
+    async with async_session_maker() as session:
+        await UserSQLARepository().find_one(session, 0)
+        assert not session.in_transaction()
+
+
+@pytest.mark.asyncio
+async def test_add_or_get_one_creates_one_record_concurrently(get_random_user_data):
+    """Tests concurrent upserts of one email creating a single record."""
+    email = get_random_user_data()["email"]
+    users_repo = UserSQLARepository()
+
+    async def provision():
+        async with async_session_maker() as session:
+            user, created = await users_repo.add_or_get_one(
+                {
+                    "email": email,
+                    "hashed_password": UNUSABLE_PASSWORD_HASH,
+                    "firstname": "",
+                    "lastname": "",
+                },
+                session,
+            )
+            # A record committed after the statement began is invisible to it.
+            if user is None:
+                user = await users_repo.find_one(session, None, email)
+            return user, created
+
+    results = await asyncio.gather(*(provision() for _ in range(5)))
+    user, created = await provision()
+    async with async_session_maker() as session:
+        stored_users = await session.scalar(
+            select(func.count()).select_from(User).where(User.email == email)
+        )
+        await session.execute(delete(User).where(User.email == email))
+        await session.commit()
+    assert stored_users == 1
+    assert [created for _, created in results].count(True) == 1
+    assert len({user["id"] for user, _ in results}) == 1
+    assert created is False
+    assert user["id"] == results[0][0]["id"]
+    assert not verify_password(UNUSABLE_PASSWORD_HASH, user["hashed_password"])
+    assert not verify_password("", user["hashed_password"])